@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+
+logger = logging.getLogger("arxiv_fetcher")
+
+ATOM_NS = {"atom": "http://www.w3.org/2005/Atom"}
+
+class TokenBucket:
+    """
+    Async token bucket shared by every request to a rate-limited API.
+
+    Tokens refill at `rate` per second up to `capacity`; acquire() waits until one is available,
+    so concurrent searches are spread out instead of bursting past the limit.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def parse_feed(feed: str) -> List[Dict]:
+    """Parse an arXiv API Atom feed into plain dicts with the fields search_papers stores."""
+    root = ET.fromstring(feed)
+    entries = []
+    for entry in root.findall("atom:entry", ATOM_NS):
+        entry_id = entry.findtext("atom:id", default="", namespaces=ATOM_NS)
+        if "arxiv.org/abs/" not in entry_id:
+            # arXiv reports query errors as an entry without a paper ID
+            continue
+        pdf_url = None
+        for link in entry.findall("atom:link", ATOM_NS):
+            if link.get("title") == "pdf":
+                pdf_url = link.get("href")
+        entries.append({
+            "paperId": entry_id.split("arxiv.org/abs/")[-1],
+            "title": " ".join(entry.findtext("atom:title", default="", namespaces=ATOM_NS).split()),
+            "summary": entry.findtext("atom:summary", default="", namespaces=ATOM_NS).strip(),
+            "pdf_url": pdf_url,
+            "published": entry.findtext("atom:published", default="", namespaces=ATOM_NS)[:10],
+            "authors": [
+                author.findtext("atom:name", default="", namespaces=ATOM_NS)
+                for author in entry.findall("atom:author", ATOM_NS)
+            ],
+        })
+    return entries
+
+class ArxivFetcher:
+    """Pages through arXiv API search results asynchronously, pacing every request through a shared TokenBucket."""
+
+    def __init__(self, base_url: str, rate_limiter: TokenBucket, page_size: int = 100, max_retries: int = 3, client: Optional[httpx.AsyncClient] = None):
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.page_size = page_size
+        self.max_retries = max_retries
+        self.client = client or httpx.AsyncClient(timeout=30.0, follow_redirects=True)
+
+    async def _fetch_page(self, query: str, start: int, count: int) -> List[Dict]:
+        params = {
+            "search_query": query,
+            "start": start,
+            "max_results": count,
+            "sortBy": "relevance",
+            "sortOrder": "descending",
+        }
+        for attempt in range(1, self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                response = await self.client.get(self.base_url, params=params)
+                response.raise_for_status()
+                return parse_feed(response.text)
+            except (httpx.HTTPError, ET.ParseError) as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("arXiv request failed (attempt %d/%d): %s", attempt, self.max_retries, e)
+        return []
+
+    async def search(self, query: str, max_results: int) -> AsyncIterator[List[Dict]]:
+        """Yield result pages in relevance order as they arrive, up to max_results entries."""
+        start = 0
+        while start < max_results:
+            count = min(self.page_size, max_results - start)
+            page = await self._fetch_page(query, start, count)
+            if page:
+                yield page
+            if len(page) < count:
+                break
+            start += count
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
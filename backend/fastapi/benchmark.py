@@ -0,0 +1,382 @@
+"""
+Benchmarks for the recommendation scoring stages.
+
+Usage:
+    python benchmark.py boosts [--sizes 5000 20000] [--repeat 20]
+    python benchmark.py topk [--sizes 5000 20000] [--k 20] [--trials 2000]
+    python benchmark.py startup [--top 15] [--target-seconds 3]
+    python benchmark.py endpoints [--sizes 500 2000] [--modes inprocess asgi] [--save-baseline baseline.json | --baseline baseline.json]
+"""
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from dataclasses import dataclass
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+import httpx
+import numpy as np
+
+from main import calculate_recency_score, calculate_recency_scores, apply_score_boosts, blend_scores, top_k_indices, OPEN_ACCESS_BOOST
+from main import (
+    app, paper_corpus, response_cache, Paper, User, PaperRecommendationRequest, HybridRecommendationRequest, UserRecommendationRequest,
+    calculate_content_based_scores, calculate_collaborative_scores, calculate_hybrid_scores, calculate_user_similarities,
+)
+from corpus import paper_text
+
+def reference_boosts(similarities: List[float], open_access: List[bool], years: List[Optional[int]]) -> List[float]:
+    """Per-paper loop that calculate_content_based_scores used before the boosts were vectorized."""
+    boosted_similarities = []
+    for i in range(len(similarities)):
+        base_similarity = similarities[i]
+        if open_access[i]:
+            base_similarity = min(base_similarity + OPEN_ACCESS_BOOST, 1.0)
+        recency_boost = calculate_recency_score(years[i])
+        base_similarity = min(base_similarity + recency_boost, 1.0)
+        boosted_similarities.append(base_similarity)
+    return boosted_similarities
+
+def reference_blend(content_scores: List[float], collaborative_scores: List[float], n: int, content_weight: float, collaborative_weight: float) -> List[float]:
+    """Per-index loop that hybrid_recommend_papers used before the blend was vectorized."""
+    hybrid_scores = []
+    for i in range(n):
+        content_score = content_scores[i] if i < len(content_scores) else 0.0
+        collaborative_score = collaborative_scores[i] if i < len(collaborative_scores) else 0.0
+        hybrid_scores.append((content_score * content_weight) + (collaborative_score * collaborative_weight))
+    return hybrid_scores
+
+def vectorized_boosts(similarities: np.ndarray, open_access: List[bool], years: List[Optional[int]]) -> np.ndarray:
+    open_access_boosts = np.where(np.asarray(open_access), OPEN_ACCESS_BOOST, 0.0)
+    recency_boosts = calculate_recency_scores([year or 0 for year in years])
+    return apply_score_boosts(similarities, open_access_boosts, recency_boosts)
+
+def best_of(fn: Callable, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+def bench_boosts(sizes: List[int], repeat: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    print(f"{'papers':>8} {'stage':>8} {'loop (ms)':>10} {'numpy (ms)':>11} {'speedup':>8}  equal")
+    for n in sizes:
+        # Include exact 0/1 similarities and missing/future years to cover every branch
+        similarities = [rng.choice([0.0, 1.0, rng.random(), rng.random() * 1.2]) for _ in range(n)]
+        open_access = [rng.random() < 0.5 for _ in range(n)]
+        years = [rng.choice([None, 0, rng.randint(1990, 2030)]) for _ in range(n)]
+        collaborative = [rng.random() for _ in range(n)]
+
+        expected = reference_boosts(similarities, open_access, years)
+        actual = vectorized_boosts(np.asarray(similarities), open_access, years).tolist()
+        loop_time = best_of(lambda: reference_boosts(similarities, open_access, years), repeat)
+        numpy_time = best_of(lambda: vectorized_boosts(np.asarray(similarities), open_access, years), repeat)
+        print(f"{n:>8} {'boost':>8} {loop_time * 1000:>10.2f} {numpy_time * 1000:>11.2f} {loop_time / numpy_time:>7.1f}x  {actual == expected}")
+
+        expected = reference_blend(expected, collaborative, n, 0.6, 0.4)
+        actual = blend_scores(actual, collaborative, 0.6, 0.4).tolist()
+        loop_time = best_of(lambda: reference_blend(similarities, collaborative, n, 0.6, 0.4), repeat)
+        numpy_time = best_of(lambda: blend_scores(similarities, collaborative, 0.6, 0.4), repeat)
+        print(f"{n:>8} {'blend':>8} {loop_time * 1000:>10.2f} {numpy_time * 1000:>11.2f} {loop_time / numpy_time:>7.1f}x  {actual == expected}")
+
+def bench_top_k(sizes: List[int], k: int, trials: int, repeat: int, seed: int = 0) -> bool:
+    """Partial top-k selection vs a stable full sort on tie-heavy scores. Returns whether every trial matched."""
+    rng = np.random.default_rng(seed)
+    all_equal = True
+    print(f"{'papers':>8} {'sort (ms)':>10} {'top-k (ms)':>11} {'speedup':>8}  equal")
+    for n in sizes:
+        mismatches = 0
+        for _ in range(trials):
+            # Few distinct values (zero similarity plus a handful of boosts) so the k-th score is usually tied
+            scores = rng.choice(rng.random(rng.integers(1, 8)), size=n)
+            trial_k = int(rng.integers(1, min(k, n) + 1))
+            if not np.array_equal(top_k_indices(scores, trial_k), np.argsort(-scores, kind="stable")[:trial_k]):
+                mismatches += 1
+        all_equal = all_equal and mismatches == 0
+
+        scores = rng.choice(rng.random(5), size=n)
+        sort_time = best_of(lambda: np.argsort(-scores, kind="stable")[:k], repeat)
+        top_k_time = best_of(lambda: top_k_indices(scores, k), repeat)
+        equal = "True" if mismatches == 0 else f"False ({mismatches}/{trials} trials differ)"
+        print(f"{n:>8} {sort_time * 1000:>10.2f} {top_k_time * 1000:>11.2f} {sort_time / top_k_time:>7.1f}x  {equal}")
+    return all_equal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+FIELDS_OF_STUDY = [
+    "Computer Science", "Medicine", "Biology", "Physics", "Mathematics", "Chemistry", "Economics",
+    "Psychology", "Engineering", "Materials Science", "Environmental Science", "Sociology",
+]
+
+@dataclass
+class SyntheticCorpus:
+    papers: List[Paper]
+    users: List[User]
+    vocabulary: List[str]
+
+def make_corpus(n_papers: int, n_users: int, abstract_words: int, seed: int = 0) -> SyntheticCorpus:
+    """Random papers and users; word frequencies follow a Zipf-like curve like real abstracts."""
+    rng = random.Random(seed)
+    vocabulary = list(dict.fromkeys(
+        "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 10))) for _ in range(20000)
+    ))
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+    def words(k: int) -> str:
+        return " ".join(rng.choices(vocabulary, weights=weights, k=k))
+
+    papers = [
+        Paper(
+            paperId=f"paper-{i}",
+            title=words(8),
+            fieldsOfStudy=rng.sample(FIELDS_OF_STUDY, rng.randint(1, 3)),
+            abstract=words(max(1, int(rng.gauss(abstract_words, abstract_words / 4)))),
+            url=f"https://example.org/paper-{i}",
+            openAccessPdf={"url": f"https://example.org/paper-{i}.pdf"} if rng.random() < 0.5 else None,
+            year=rng.choice([None, rng.randint(1995, 2025)]),
+        )
+        for i in range(n_papers)
+    ]
+    users = [User(interests=words(rng.randint(3, 8)).split()) for _ in range(n_users)]
+    return SyntheticCorpus(papers=papers, users=users, vocabulary=vocabulary)
+
+def pick_saved(rng: random.Random, corpus: SyntheticCorpus, candidates: List[Paper], count: int, overlap: float) -> List[Paper]:
+    """Saved papers of which roughly `overlap` are also among the candidates."""
+    return [rng.choice(candidates) if rng.random() < overlap else rng.choice(corpus.papers) for _ in range(count)]
+
+def build_requests(corpus: SyntheticCorpus, size: int, saves: int, overlap: float, seed: int = 0) -> Dict[str, Any]:
+    """Requests for every stage with `size` candidates (papers, or users for the users stage)."""
+    rng = random.Random(seed)
+    candidates = corpus.papers[:size]
+    user_interests = rng.sample(corpus.vocabulary[:2000], 5)
+    saved_papers = pick_saved(rng, corpus, candidates, 10, overlap)
+    hybrid = HybridRecommendationRequest(
+        user_interests=user_interests,
+        papers=candidates,
+        saved_papers=saved_papers,
+        followers_saved_papers=pick_saved(rng, corpus, candidates, saves, overlap),
+        similar_users_saved_papers=pick_saved(rng, corpus, candidates, saves, overlap),
+    )
+    return {
+        "content": PaperRecommendationRequest(user_interests=user_interests, papers=candidates, saved_papers=saved_papers),
+        "hybrid": hybrid,
+        "users": UserRecommendationRequest(user_interests=user_interests, users=corpus.users[:size]),
+    }
+
+# stage -> (in-process call, ASGI endpoint or None when the stage has no endpoint of its own)
+STAGES: Dict[str, Tuple[Callable[[Dict[str, Any]], Any], Optional[str], str]] = {
+    "content": (lambda r: calculate_content_based_scores(r["content"].user_interests, r["content"].papers, r["content"].saved_papers), "/recommend-papers", "content"),
+    "collaborative": (lambda r: calculate_collaborative_scores(r["hybrid"].papers, r["hybrid"].followers_saved_papers, r["hybrid"].similar_users_saved_papers), None, "hybrid"),
+    "hybrid": (lambda r: calculate_hybrid_scores(r["hybrid"]), "/hybrid-recommend-papers", "hybrid"),
+    "users": (lambda r: calculate_user_similarities(r["users"]), "/recommend-users", "users"),
+}
+
+def summarize(latencies: List[float], peak_bytes: int) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "throughput_rps": round(len(latencies) / sum(latencies), 2),
+        "peak_memory_kb": round(peak_bytes / 1024, 1),
+    }
+
+def measure_inprocess(fn: Callable[[], Any], iterations: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    # Memory is traced on a separate call since tracemalloc slows everything down
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(latencies, peak)
+
+async def measure_asgi(path: str, body: bytes, iterations: int, warmup: int) -> Dict[str, float]:
+    """Same as measure_inprocess but through the whole ASGI app: validation, scoring pool and serialization."""
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Content-Type": "application/json"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def call():
+            response = await client.post(path, content=body, headers=headers)
+            response.raise_for_status()
+
+        for _ in range(warmup):
+            await call()
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+        tracemalloc.start()
+        await call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return summarize(latencies, peak)
+
+def bench_endpoints(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    corpus = make_corpus(max(args.sizes), max(args.sizes), args.abstract_words, args.seed)
+    # Fit the shared TF-IDF model over the synthetic collection, as warm_up() does with MongoDB
+    paper_corpus.fit({paper.paperId: paper_text(paper.fieldsOfStudy, paper.abstract, paper.title) for paper in corpus.papers})
+    # Every iteration posts the same body, so the response cache would turn the ASGI runs into cache hits
+    response_cache.ttl_seconds = 0
+
+    results = {}
+    print(f"{'stage':>14} {'mode':>10} {'size':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'peak KiB':>10}")
+    for size in args.sizes:
+        requests = build_requests(corpus, size, args.saves, args.overlap, args.seed)
+        for stage in args.stages:
+            fn, path, payload = STAGES[stage]
+            for mode in args.modes:
+                if mode == "inprocess":
+                    result = measure_inprocess(lambda: fn(requests), args.iterations, args.warmup)
+                elif path is not None:
+                    body = requests[payload].model_dump_json().encode("utf-8")
+                    result = asyncio.run(measure_asgi(path, body, args.iterations, args.warmup))
+                else:
+                    continue
+                results[f"{stage}/{mode}/{size}"] = {"stage": stage, "mode": mode, "size": size, **result}
+                print(f"{stage:>14} {mode:>10} {size:>7} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                      f"{result['p99_ms']:>9.2f} {result['throughput_rps']:>8.1f} {result['peak_memory_kb']:>10.0f}")
+    return results
+
+def benchmark_config(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "abstract_words": args.abstract_words,
+        "saves": args.saves,
+        "overlap": args.overlap,
+        "iterations": args.iterations,
+        "seed": args.seed,
+    }
+
+def check_regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Results whose p50 latency or peak memory grew by more than `tolerance` over the baseline."""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "peak_memory_kb"):
+            if result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{key} {metric}: {previous[metric]} -> {result[metric]}")
+    return regressions
+
+def profile_imports(module: str, top: int) -> None:
+    """Import a module in a fresh interpreter under -X importtime and print its slowest direct imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    total = 0
+    direct = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # importtime indents nested imports by two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == module:
+            total = int(cumulative)
+        elif depth == 1:
+            direct.append((int(cumulative), name.strip()))
+
+    print(f"import {module}: {total / 1000:.0f} ms")
+    for cumulative, name in sorted(direct, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>10.1f} ms  {name}")
+
+def time_to_ready(port: int, target_seconds: float, timeout: float = 60.0) -> bool:
+    """Start the app under uvicorn and time how long until it accepts connections and until /ready is 200."""
+    started_at = time.perf_counter()
+    listening_after = None
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started_at < timeout:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1.0)
+            except httpx.TransportError:
+                time.sleep(0.1)
+                continue
+            if listening_after is None:
+                listening_after = time.perf_counter() - started_at
+            if response.status_code == 200:
+                ready_after = time.perf_counter() - started_at
+                break
+            time.sleep(0.1)
+        else:
+            print(f"Not ready after {timeout:.0f}s")
+            return False
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"accepting connections after {listening_after:.2f}s, ready after {ready_after:.2f}s (target {target_seconds:.2f}s)")
+    return ready_after <= target_seconds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    boosts_parser = subparsers.add_parser("boosts", help="Loop vs NumPy score boosting and hybrid blending")
+    boosts_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    boosts_parser.add_argument("--repeat", type=int, default=20)
+
+    top_k_parser = subparsers.add_parser("topk", help="Partial top-k selection vs a stable full sort, checking they agree on ties")
+    top_k_parser.add_argument("--sizes", type=int, nargs="+", default=[100, 5000, 20000])
+    top_k_parser.add_argument("--k", type=int, default=20)
+    top_k_parser.add_argument("--trials", type=int, default=2000)
+    top_k_parser.add_argument("--repeat", type=int, default=20)
+
+    startup_parser = subparsers.add_parser("startup", help="Import-time profile and time until /ready reports ready")
+    startup_parser.add_argument("--top", type=int, default=15)
+    startup_parser.add_argument("--port", type=int, default=8765)
+    startup_parser.add_argument("--target-seconds", type=float, default=3.0)
+
+    endpoints_parser = subparsers.add_parser("endpoints", help="Latency, throughput and peak memory per scoring stage on synthetic data")
+    endpoints_parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000], help="Candidate papers (or users for the users stage)")
+    endpoints_parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    endpoints_parser.add_argument("--modes", nargs="+", choices=["inprocess", "asgi"], default=["inprocess", "asgi"])
+    endpoints_parser.add_argument("--abstract-words", type=int, default=150, help="Mean abstract length in words")
+    endpoints_parser.add_argument("--saves", type=int, default=200, help="Papers saved by followers and by similar users, each")
+    endpoints_parser.add_argument("--overlap", type=float, default=0.3, help="Fraction of saved papers that are also candidates")
+    endpoints_parser.add_argument("--iterations", type=int, default=20)
+    endpoints_parser.add_argument("--warmup", type=int, default=2)
+    endpoints_parser.add_argument("--seed", type=int, default=0)
+    endpoints_parser.add_argument("--save-baseline", metavar="FILE", help="Write the results to FILE")
+    endpoints_parser.add_argument("--baseline", metavar="FILE", help="Compare against FILE and exit non-zero on regressions")
+    endpoints_parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before a result counts as a regression")
+
+    args = parser.parse_args()
+    if args.command == "boosts":
+        bench_boosts(args.sizes, args.repeat)
+    elif args.command == "topk":
+        if not bench_top_k(args.sizes, args.k, args.trials, args.repeat):
+            sys.exit(1)
+    elif args.command == "startup":
+        profile_imports("main", args.top)
+        if not time_to_ready(args.port, args.target_seconds):
+            sys.exit(1)
+    elif args.command == "endpoints":
+        results = bench_endpoints(args)
+        if args.save_baseline:
+            with open(args.save_baseline, "w") as file:
+                json.dump({"config": benchmark_config(args), "results": results}, file, indent=2)
+            print(f"Baseline written to {args.save_baseline}")
+        if args.baseline:
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+            if baseline.get("config") != benchmark_config(args):
+                print("Warning: baseline was recorded with a different configuration")
+            regressions = check_regressions(results, baseline, args.tolerance)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            if regressions:
+                sys.exit(1)
+            print("No regressions against the baseline")
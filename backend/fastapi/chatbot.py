@@ -1,9 +1,11 @@
 from dotenv import load_dotenv
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from contextlib import AsyncExitStack
 import json
+import os
+import time
 import asyncio
 import nest_asyncio
 
@@ -11,10 +13,83 @@ nest_asyncio.apply()
 
 load_dotenv()
 
+# Maximum number of tool calls from one model turn that run at the same time
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+
+# Read-only tools whose results are reused for identical arguments within a session
+IDEMPOTENT_TOOLS = {"extract_info", "extract_info_batch", "get_papers_by_topic"}
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", "300"))
+
+# Total characters of tool results re-sent per request; older results are truncated beyond it
+CONTEXT_BUDGET_CHARS = int(os.getenv("CONTEXT_BUDGET_CHARS", "40000"))
+TRUNCATED_RESULT_CHARS = 500
+
+def compact_tool_content(content) -> str:
+    """Flatten MCP tool result content to text, re-serializing JSON without whitespace."""
+    texts = []
+    for item in content:
+        text = getattr(item, 'text', None)
+        if text is None:
+            text = str(item)
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            parsed = None
+        # Scalars are left alone, FastMCP sends list items such as paper IDs ("2101.00010") as separate texts
+        if isinstance(parsed, (dict, list)):
+            text = json.dumps(parsed, separators=(',', ':'))
+        texts.append(text)
+    return "\n".join(texts)
+
+def is_not_found(name: str, text: str) -> bool:
+    """Whether an idempotent tool found nothing, which a later search_papers may change."""
+    if name == "extract_info":
+        return text.startswith("There's no saved information")
+    if name == "extract_info_batch":
+        try:
+            return bool(json.loads(text).get("missing"))
+        except (ValueError, AttributeError):
+            return True
+    if name == "get_papers_by_topic":
+        return text.strip() in ("", "[]")
+    return False
+
+def trim_tool_results(messages, budget: int = CONTEXT_BUDGET_CHARS):
+    """
+    Truncate the oldest tool results until all of them fit in the budget.
+    The results of the latest turn are always sent in full.
+    """
+    older_results = [
+        block
+        for message in messages[:-1]
+        if message['role'] == 'user' and isinstance(message['content'], list)
+        for block in message['content']
+        if isinstance(block, dict) and block.get('type') == 'tool_result' and isinstance(block.get('content'), str)
+    ]
+    latest = messages[-1]['content'] if messages and isinstance(messages[-1]['content'], list) else []
+    total = sum(len(block['content']) for block in older_results)
+    total += sum(len(block['content']) for block in latest if isinstance(block, dict) and isinstance(block.get('content'), str))
+
+    for block in older_results:
+        if total <= budget:
+            break
+        content = block['content']
+        if len(content) <= TRUNCATED_RESULT_CHARS:
+            continue
+        note = f"... [truncated, {len(content)} chars total]"
+        truncated = content[:TRUNCATED_RESULT_CHARS - len(note)] + note
+        total -= len(content) - len(truncated)
+        block['content'] = truncated
+
 class MCP_ChatBot:
-    def __init__(self):
+    def __init__(self, anthropic_client=None, tool_concurrency: int = TOOL_CONCURRENCY):
         self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+        self.anthropic = anthropic_client or AsyncAnthropic()
+        self.tool_semaphore = asyncio.Semaphore(tool_concurrency)
+        # Seconds from sending each model request to its first streamed token
+        self.first_token_latencies = []
+        # (tool name, arguments) -> (expiry time, task resolving to the tool result text)
+        self.tool_cache = {}
         # Tools list required for Anthropic API
         self.available_tools = []
         # Prompts list for quick display 
@@ -80,51 +155,115 @@ class MCP_ChatBot:
             print(f"Error loading server config: {e}")
             raise
     
+    async def run_tool(self, session, name, arguments):
+        """Call a tool and return (compacted result text, is_error)."""
+        async with self.tool_semaphore:
+            result = await session.call_tool(name, arguments=arguments)
+        return compact_tool_content(result.content), bool(result.isError)
+
+    async def cached_run_tool(self, session, name, arguments):
+        """
+        run_tool with a per-session memo for idempotent tools. Identical calls made while the
+        first one is still running share its result; errors and not-found results are never
+        cached, and any other tool (e.g. search_papers storing papers) clears the memo.
+        """
+        if name not in IDEMPOTENT_TOOLS:
+            # Cleared on both ends so reads that overlap the write aren't kept either
+            self.tool_cache.clear()
+            try:
+                return await self.run_tool(session, name, arguments)
+            finally:
+                self.tool_cache.clear()
+
+        key = (name, json.dumps(arguments, sort_keys=True))
+        now = time.monotonic()
+        cached = self.tool_cache.get(key)
+        if cached is None or cached[0] <= now:
+            self.tool_cache = {k: v for k, v in self.tool_cache.items() if v[0] > now}
+            cached = (now + TOOL_CACHE_TTL_SECONDS, asyncio.ensure_future(self.run_tool(session, name, arguments)))
+            self.tool_cache[key] = cached
+        task = cached[1]
+        try:
+            text, is_error = await asyncio.shield(task)
+        except Exception:
+            if self.tool_cache.get(key) is cached:
+                del self.tool_cache[key]
+            raise
+        if (is_error or is_not_found(name, text)) and self.tool_cache.get(key) is cached:
+            del self.tool_cache[key]
+        return text, is_error
+
+    async def call_tool(self, tool_use):
+        """Run one tool_use block and return its tool_result content block."""
+        session = self.sessions.get(tool_use.name)
+        if not session:
+            print(f"Tool '{tool_use.name}' not found.")
+            return {
+                "type": "tool_result",
+                "tool_use_id": tool_use.id,
+                "content": f"Tool '{tool_use.name}' not found.",
+                "is_error": True
+            }
+
+        try:
+            text, is_error = await self.cached_run_tool(session, tool_use.name, tool_use.input)
+        except Exception as e:
+            print(f"Error calling tool '{tool_use.name}': {e}")
+            return {
+                "type": "tool_result",
+                "tool_use_id": tool_use.id,
+                "content": f"Error: {e}",
+                "is_error": True
+            }
+        tool_result = {
+            "type": "tool_result",
+            "tool_use_id": tool_use.id,
+            "content": text
+        }
+        if is_error:
+            tool_result["is_error"] = True
+        return tool_result
+
     async def process_query(self, query):
         messages = [{'role':'user', 'content':query}]
         
         while True:
-            response = self.anthropic.messages.create(
+            tool_tasks = []
+            first_token_at = None
+            started_at = time.perf_counter()
+            async with self.anthropic.messages.stream(
                 max_tokens = 2024,
                 model = 'claude-3-7-sonnet-20250219', 
                 tools = self.available_tools,
                 messages = messages
-            )
-            
-            assistant_content = []
-            has_tool_use = False
-            
-            for content in response.content:
-                if content.type == 'text':
-                    print(content.text)
-                    assistant_content.append(content)
-                elif content.type == 'tool_use':
-                    has_tool_use = True
-                    assistant_content.append(content)
-                    messages.append({'role':'assistant', 'content':assistant_content})
-                    
-                    # Get session and call tool
-                    session = self.sessions.get(content.name)
-                    if not session:
-                        print(f"Tool '{content.name}' not found.")
-                        break
-                        
-                    result = await session.call_tool(content.name, arguments=content.input)
-                    messages.append({
-                        "role": "user", 
-                        "content": [
-                            {
-                                "type": "tool_result",
-                                "tool_use_id": content.id,
-                                "content": result.content
-                            }
-                        ]
-                    })
+            ) as stream:
+                async for event in stream:
+                    if event.type == 'content_block_delta' and first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    elif event.type == 'text':
+                        print(event.text, end='', flush=True)
+                    elif event.type == 'content_block_stop':
+                        if event.content_block.type == 'text':
+                            print()
+                        elif event.content_block.type == 'tool_use':
+                            # Start the tool while the model is still streaming the rest of the turn
+                            tool_tasks.append(asyncio.create_task(self.call_tool(event.content_block)))
+                response = await stream.get_final_message()
+
+            if first_token_at is not None:
+                self.first_token_latencies.append(first_token_at - started_at)
+                print(f"[time to first token: {(first_token_at - started_at) * 1000:.0f} ms]")
             
             # Exit loop if no tool was used
-            if not has_tool_use:
+            if not tool_tasks:
                 break
 
+            # Tool results go back in request order
+            messages.append({'role':'assistant', 'content':response.content})
+            tool_results = await asyncio.gather(*tool_tasks)
+            messages.append({'role':'user', 'content':list(tool_results)})
+            trim_tool_results(messages)
+
     async def get_resource(self, resource_uri):
         session = self.sessions.get(resource_uri)
         
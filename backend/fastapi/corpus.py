@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+import threading
+import os
+
+# scikit-learn is imported on first fit so importing this module stays cheap
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+def paper_text(fields_of_study: Optional[List[str]], abstract: Optional[str], title: Optional[str]) -> str:
+    """Build the text used to vectorize a paper (fields of study, abstract, then title)."""
+    paper_content = []
+    if fields_of_study:
+        paper_content.extend(fields_of_study)
+    if abstract:
+        paper_content.append(abstract)
+    if title:
+        paper_content.append(title)
+    return " ".join(paper_content)
+
+class PaperCorpus:
+    """
+    Corpus-level TF-IDF model shared by every recommendation request.
+
+    The vectorizer is fitted once over the paper collection and kept in memory, so requests
+    only need to transform texts with a fixed vocabulary. Papers that arrive in requests but
+    are not yet part of the corpus are recorded; once enough of them have accumulated the
+    vectorizer is refitted in a background thread and swapped in. At most max_documents texts
+    are kept for refits, the least recently seen papers are dropped first, so memory and refit
+    time are bounded however many distinct papers requests bring in.
+    """
+
+    def __init__(self, max_features: int = 5000, refit_ratio: float = 0.2, max_documents: int = 100000):
+        self.max_features = max_features
+        self.refit_ratio = refit_ratio
+        self.max_documents = max_documents
+        self.vectorizer: Optional["TfidfVectorizer"] = None
+        # Bumped on every (re)fit so callers can tell vectors from different vocabularies apart
+        self.version = 0
+        self._documents: "OrderedDict[str, str]" = OrderedDict()
+        self._pending = 0
+        self._refitting = False
+        self._lock = threading.RLock()
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.vectorizer is not None
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @property
+    def vocabulary_size(self) -> int:
+        vectorizer = self.vectorizer
+        return len(vectorizer.vocabulary_) if vectorizer is not None else 0
+
+    def fit(self, documents: Dict[str, str]) -> bool:
+        """Fit the vectorizer over a paperId -> text mapping, replacing the current model."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(max_features=self.max_features, stop_words='english')
+        try:
+            vectorizer.fit(list(documents.values()))
+        except ValueError:
+            # Empty vocabulary (no documents or only stop words), keep the previous model
+            return False
+
+        with self._lock:
+            for paper_id, text in documents.items():
+                self._documents.setdefault(paper_id, text)
+            self._evict()
+            # Papers added or edited while we were fitting count towards the next refit
+            self._pending = sum(
+                1 for paper_id, text in self._documents.items() if documents.get(paper_id) != text
+            )
+            self.vectorizer = vectorizer
+            self.version += 1
+        return True
+
+    def transform(self, texts: List[str]) -> Tuple[Any, int]:
+        """Vectorize texts with the corpus vocabulary. Returns the matrix and the model version used."""
+        with self._lock:
+            vectorizer, version = self.vectorizer, self.version
+        return vectorizer.transform(texts), version
+
+    def add_documents(self, documents: Dict[str, str]) -> None:
+        """Record new or changed papers so the next refit includes them."""
+        with self._lock:
+            changed = {
+                paper_id: text for paper_id, text in documents.items()
+                if self._documents.get(paper_id) != text
+            }
+            for paper_id in documents.keys() - changed.keys():
+                self._documents.move_to_end(paper_id)
+            if not changed:
+                return
+            self._documents.update(changed)
+            for paper_id in changed:
+                self._documents.move_to_end(paper_id)
+            self._pending += len(changed)
+            self._evict()
+            bootstrap = None if self.is_fitted else dict(self._documents)
+
+        if bootstrap is not None:
+            # Nothing loaded at startup, bootstrap the vocabulary from the first papers we see
+            self.fit(bootstrap)
+        else:
+            self._maybe_refit()
+
+    def _evict(self) -> None:
+        # Least recently seen first; the caller holds the lock
+        while len(self._documents) > self.max_documents:
+            self._documents.popitem(last=False)
+        self._pending = min(self._pending, len(self._documents))
+
+    def _maybe_refit(self) -> None:
+        with self._lock:
+            if self._refitting or self._pending < max(1, self.refit_ratio * len(self._documents)):
+                return
+            self._refitting = True
+            documents = dict(self._documents)
+
+        def refit():
+            try:
+                self.fit(documents)
+            finally:
+                with self._lock:
+                    self._refitting = False
+
+        threading.Thread(target=refit, name="corpus-refit", daemon=True).start()
+
+@dataclass
+class CachedPaperVector:
+    content_hash: str
+    corpus_version: int
+    boost_year: int
+    vector: Any
+    open_access_boost: float
+    recency_boost: float
+
+class PaperVectorCache:
+    """Bounded LRU cache mapping paperId to its TF-IDF vector and derived boosts."""
+
+    def __init__(self, max_size: int = 50000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CachedPaperVector]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, paper_id: str, content_hash: str, corpus_version: int, boost_year: int) -> Optional[CachedPaperVector]:
+        with self._lock:
+            entry = self._entries.get(paper_id)
+            # Edited papers, a refitted vocabulary or a new year (recency boost) all invalidate the entry
+            if (entry is None or entry.content_hash != content_hash
+                    or entry.corpus_version != corpus_version or entry.boost_year != boost_year):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(paper_id)
+            self.hits += 1
+            return entry
+
+    def put(self, paper_id: str, entry: CachedPaperVector) -> None:
+        with self._lock:
+            self._entries[paper_id] = entry
+            self._entries.move_to_end(paper_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+def load_corpus_from_mongo(corpus: PaperCorpus, mongo_uri: Optional[str] = None) -> int:
+    """Fit the corpus over the papers collection. Returns the number of papers loaded."""
+    mongo_uri = mongo_uri or os.getenv("MONGO_URI")
+    if not mongo_uri:
+        return 0
+
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_uri)
+    try:
+        papers = client.get_default_database().papers.find(
+            {}, {"_id": 0, "paperId": 1, "title": 1, "abstract": 1, "fieldsOfStudy": 1}
+        )
+        documents = {
+            paper["paperId"]: paper_text(paper.get("fieldsOfStudy"), paper.get("abstract"), paper.get("title"))
+            for paper in papers if paper.get("paperId")
+        }
+    finally:
+        client.close()
+
+    if documents and corpus.fit(documents):
+        return len(documents)
+    return 0
@@ -0,0 +1,227 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Iterable
+import os
+import shelve
+import threading
+import time
+
+class FeedStore(ABC):
+    """
+    Materialized per-user feeds plus the inputs they are computed from.
+
+    Each user record holds the profile the Node backend pushes (interests, saved paper IDs and
+    the users they follow), the last computed feed with its computed_at time, and the time the
+    inputs last changed (invalidated_at). A feed is stale when it was computed before the last
+    invalidation, so an invalidation that races a refresh is never lost.
+    """
+
+    @abstractmethod
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_users(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update_profile(self, user_id: str, **changes: Any) -> Dict[str, Any]:
+        """Set profile fields, creating the user if needed, and invalidate their feed."""
+
+    @abstractmethod
+    def put_feed(self, user_id: str, results: List[Dict[str, Any]], computed_at: float, depends_on: List[str]) -> None:
+        """Store a computed feed with the similar users whose saves it was computed from."""
+
+    @abstractmethod
+    def invalidate(self, user_ids: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate_all(self) -> None:
+        ...
+
+    @abstractmethod
+    def followers_of(self, user_id: str) -> List[str]:
+        """Users whose profile follows user_id, i.e. whose followers' saved papers include user_id's saves."""
+
+    @abstractmethod
+    def dependents_of(self, user_id: str) -> List[str]:
+        """Users whose current feed depends on user_id as a similar user, i.e. on their saves."""
+
+    @abstractmethod
+    def stale_user_ids(self, limit: int) -> List[str]:
+        """Users with a profile whose feed is missing or older than their last invalidation."""
+
+    @abstractmethod
+    def get_candidates(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def set_candidates(self, paper_ids: List[str]) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+def empty_user(user_id: str) -> Dict[str, Any]:
+    return {
+        "_id": user_id,
+        "profile": {"interests": [], "saved_paper_ids": [], "following": []},
+        "feed": None,
+        "invalidated_at": time.time(),
+    }
+
+def is_stale(record: Dict[str, Any]) -> bool:
+    feed = record.get("feed")
+    return feed is None or record["invalidated_at"] > feed["computed_at"]
+
+class MongoFeedStore(FeedStore):
+    """Feeds in the user_feeds collection, candidates in feed_candidates."""
+
+    def __init__(self, mongo_uri: str):
+        from pymongo import MongoClient
+
+        self._client = MongoClient(mongo_uri)
+        database = self._client.get_default_database()
+        self._feeds = database.user_feeds
+        self._candidates = database.feed_candidates
+        self._feeds.create_index("profile.following")
+        self._feeds.create_index("feed.depends_on")
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._feeds.find_one({"_id": user_id})
+
+    def get_users(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return {record["_id"]: record for record in self._feeds.find({"_id": {"$in": list(user_ids)}})}
+
+    def update_profile(self, user_id: str, **changes: Any) -> Dict[str, Any]:
+        from pymongo import ReturnDocument
+
+        defaults = {f"profile.{field}": [] for field in ("interests", "saved_paper_ids", "following") if field not in changes}
+        return self._feeds.find_one_and_update(
+            {"_id": user_id},
+            {
+                "$set": {**{f"profile.{field}": value for field, value in changes.items()}, "invalidated_at": time.time()},
+                "$setOnInsert": {**defaults, "feed": None},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def put_feed(self, user_id: str, results: List[Dict[str, Any]], computed_at: float, depends_on: List[str]) -> None:
+        self._feeds.update_one({"_id": user_id}, {"$set": {"feed": {"results": results, "computed_at": computed_at, "depends_on": depends_on}}})
+
+    def invalidate(self, user_ids: Iterable[str]) -> None:
+        self._feeds.update_many({"_id": {"$in": list(user_ids)}}, {"$set": {"invalidated_at": time.time()}})
+
+    def invalidate_all(self) -> None:
+        self._feeds.update_many({}, {"$set": {"invalidated_at": time.time()}})
+
+    def followers_of(self, user_id: str) -> List[str]:
+        return [record["_id"] for record in self._feeds.find({"profile.following": user_id}, {"_id": 1})]
+
+    def dependents_of(self, user_id: str) -> List[str]:
+        return [record["_id"] for record in self._feeds.find({"feed.depends_on": user_id}, {"_id": 1})]
+
+    def stale_user_ids(self, limit: int) -> List[str]:
+        query = {"$or": [{"feed": None}, {"$expr": {"$gt": ["$invalidated_at", "$feed.computed_at"]}}]}
+        return [record["_id"] for record in self._feeds.find(query, {"_id": 1}).limit(limit)]
+
+    def get_candidates(self) -> List[str]:
+        document = self._candidates.find_one({"_id": "default"})
+        return document["paper_ids"] if document else []
+
+    def set_candidates(self, paper_ids: List[str]) -> None:
+        self._candidates.update_one({"_id": "default"}, {"$set": {"paper_ids": paper_ids}}, upsert=True)
+
+    def close(self) -> None:
+        self._client.close()
+
+class LocalFeedStore(FeedStore):
+    """On-disk stand-in using shelve, for development and single-replica deployments."""
+
+    CANDIDATES_KEY = "candidates"
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = shelve.open(path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._db.get(self._key(user_id))
+
+    def get_users(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            records = (self._db.get(self._key(user_id)) for user_id in user_ids)
+            return {record["_id"]: record for record in records if record is not None}
+
+    def update_profile(self, user_id: str, **changes: Any) -> Dict[str, Any]:
+        with self._lock:
+            record = self._db.get(self._key(user_id)) or empty_user(user_id)
+            record["profile"].update(changes)
+            record["invalidated_at"] = time.time()
+            self._db[self._key(user_id)] = record
+            return record
+
+    def put_feed(self, user_id: str, results: List[Dict[str, Any]], computed_at: float, depends_on: List[str]) -> None:
+        with self._lock:
+            record = self._db.get(self._key(user_id))
+            if record is None:
+                return
+            record["feed"] = {"results": results, "computed_at": computed_at, "depends_on": depends_on}
+            self._db[self._key(user_id)] = record
+
+    def invalidate(self, user_ids: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for user_id in user_ids:
+                record = self._db.get(self._key(user_id))
+                if record is not None:
+                    record["invalidated_at"] = now
+                    self._db[self._key(user_id)] = record
+
+    def invalidate_all(self) -> None:
+        now = time.time()
+        with self._lock:
+            for key in list(self._db.keys()):
+                if key.startswith("user:"):
+                    record = self._db[key]
+                    record["invalidated_at"] = now
+                    self._db[key] = record
+
+    def _records(self):
+        return (self._db[key] for key in self._db.keys() if key.startswith("user:"))
+
+    def followers_of(self, user_id: str) -> List[str]:
+        with self._lock:
+            return [record["_id"] for record in self._records() if user_id in record["profile"]["following"]]
+
+    def dependents_of(self, user_id: str) -> List[str]:
+        with self._lock:
+            return [record["_id"] for record in self._records() if record["feed"] and user_id in record["feed"].get("depends_on", [])]
+
+    def stale_user_ids(self, limit: int) -> List[str]:
+        with self._lock:
+            stale = []
+            for record in self._records():
+                if is_stale(record):
+                    stale.append(record["_id"])
+                    if len(stale) >= limit:
+                        break
+            return stale
+
+    def get_candidates(self) -> List[str]:
+        with self._lock:
+            return self._db.get(self.CANDIDATES_KEY, [])
+
+    def set_candidates(self, paper_ids: List[str]) -> None:
+        with self._lock:
+            self._db[self.CANDIDATES_KEY] = paper_ids
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -1,15 +1,164 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
-from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, NonNegativeFloat, model_validator
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Union, Literal, TYPE_CHECKING
+from fastapi.responses import Response, StreamingResponse, FileResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from corpus import PaperCorpus, PaperVectorCache, CachedPaperVector, paper_text, load_corpus_from_mongo
+from paper_store import PaperStore, PaperStoreUnavailable
+from scoring_pool import ScoringPool, ScoringPoolSaturated, ScoringTimeout
+from user_index import UserIndex, load_user_index_from_mongo
+from pdf_cache import PdfCache, PdfCacheEntry, PdfDownloader, range_length
+from metrics import Metrics, MetricsMiddleware
+from feed_store import FeedStore, MongoFeedStore, LocalFeedStore, is_stale
+from response_cache import ResponseCache
+import numpy as np
+import asyncio
+import threading
+import tempfile
+import hashlib
 import httpx
+import json
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 
-app = FastAPI()
+# scikit-learn and scipy take most of the import time; they are imported on first use or by warm_up()
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+import_started_at = time.perf_counter()
+
+# Shared TF-IDF model so requests only transform the user profile instead of refitting per call
+paper_corpus = PaperCorpus(
+    max_features=int(os.getenv("TFIDF_MAX_FEATURES", "5000")),
+    refit_ratio=float(os.getenv("CORPUS_REFIT_RATIO", "0.2")),
+    max_documents=int(os.getenv("CORPUS_MAX_DOCUMENTS", "100000")),
+)
+
+OPEN_ACCESS_BOOST = 0.2
+
+# Per-stage timings and input sizes for /metrics and the Server-Timing header, off unless enabled
+metrics = Metrics(
+    enabled=os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes"),
+    server_timing=os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes"),
+)
+
+# Vectors of recently scored papers, so repeat candidates skip the TF-IDF transform
+paper_vector_cache = PaperVectorCache(max_size=int(os.getenv("PAPER_VECTOR_CACHE_SIZE", "50000")))
+
+# Resolves paperId references in requests against the shared papers collection
+paper_store = PaperStore(
+    mongo_uri=os.getenv("MONGO_URI"),
+    max_size=int(os.getenv("PAPER_STORE_CACHE_SIZE", "50000")),
+    ttl_seconds=float(os.getenv("PAPER_STORE_TTL_SECONDS", "3600")),
+)
+
+# Interest index for mentor matching, kept current through the /users endpoints
+user_index = UserIndex()
+
+# CPU-bound scoring runs here instead of on the event loop
+scoring_pool = ScoringPool(
+    max_workers=int(os.getenv("SCORING_WORKERS", "4")),
+    max_queue=int(os.getenv("SCORING_QUEUE_DEPTH", "16")),
+    timeout=float(os.getenv("SCORING_TIMEOUT_SECONDS", "30")),
+)
+
+# App-lifetime connection pool for /proxy-pdf, created in lifespan
+PDF_PROXY_MAX_CONNECTIONS = int(os.getenv("PDF_PROXY_MAX_CONNECTIONS", "20"))
+pdf_client: Optional[httpx.AsyncClient] = None
+
+# Disk cache for proxied PDFs so repeat views don't hit arXiv/Semantic Scholar again
+pdf_cache = PdfCache(
+    directory=os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "research4all-pdf-cache")),
+    max_bytes=int(os.getenv("PDF_CACHE_MAX_BYTES", str(1024 ** 3))),
+    revalidate_after=float(os.getenv("PDF_CACHE_REVALIDATE_SECONDS", "86400")),
+)
+pdf_downloader = PdfDownloader(pdf_cache)
+
+# Serialized responses of recent recommendation requests; refreshes and pagination resend identical bodies
+response_cache = ResponseCache(
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 ** 2))),
+)
+
+# Materialized per-user feeds, refreshed in the background as events invalidate them. Off unless
+# enabled; candidates are paperIds, so refreshing also needs MONGO_URI to resolve them
+FEEDS_ENABLED = os.getenv("FEEDS_ENABLED", "false").lower() in ("1", "true", "yes")
+FEED_SIZE = int(os.getenv("FEED_SIZE", "100"))
+FEED_REFRESH_INTERVAL_SECONDS = float(os.getenv("FEED_REFRESH_INTERVAL_SECONDS", "5"))
+FEED_REFRESH_BATCH_SIZE = int(os.getenv("FEED_REFRESH_BATCH_SIZE", "256"))
+FEED_MAX_STALENESS_SECONDS = float(os.getenv("FEED_MAX_STALENESS_SECONDS", "60"))
+feed_store: Optional[FeedStore] = None
+feed_store_lock = threading.Lock()
+
+def get_feed_store() -> FeedStore:
+    """The feed store, created on first use: MongoDB when MONGO_URI is set, else a local shelve file."""
+    global feed_store
+    if feed_store is None:
+        with feed_store_lock:
+            if feed_store is None:
+                backend = os.getenv("FEED_STORE", "mongo" if os.getenv("MONGO_URI") else "local")
+                if backend == "mongo":
+                    feed_store = MongoFeedStore(os.getenv("MONGO_URI"))
+                else:
+                    feed_store = LocalFeedStore(os.getenv("FEED_STORE_PATH", os.path.join(tempfile.gettempdir(), "research4all-feeds", "feeds")))
+    return feed_store
+
+# Set by warm_up(); /ready answers 503 until then so new replicas only get traffic once warm
+startup_state: Dict[str, Any] = {"ready": False, "ready_after_seconds": None}
+
+def warm_up() -> None:
+    """Import the scoring dependencies and preload the TF-IDF corpus and user interest index."""
+    import scipy.sparse
+    import sklearn.feature_extraction.text
+    import sklearn.metrics.pairwise
+
+    try:
+        loaded = load_corpus_from_mongo(paper_corpus)
+        print(f"Loaded {loaded} papers into the TF-IDF corpus")
+    except Exception as e:
+        # The corpus bootstraps itself from incoming papers if the collection is unavailable
+        print(f"Error loading TF-IDF corpus: {e}")
+    try:
+        loaded = load_user_index_from_mongo(user_index)
+        print(f"Loaded {loaded} users into the interest index")
+    except Exception as e:
+        print(f"Error loading user interest index: {e}")
+
+    startup_state["ready_after_seconds"] = time.perf_counter() - import_started_at
+    startup_state["ready"] = True
+    print(f"Ready {startup_state['ready_after_seconds']:.2f}s after import")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pdf_client
+    pdf_client = httpx.AsyncClient(
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=PDF_PROXY_MAX_CONNECTIONS, max_keepalive_connections=PDF_PROXY_MAX_CONNECTIONS),
+        timeout=httpx.Timeout(float(os.getenv("PDF_PROXY_TIMEOUT_SECONDS", "30")), pool=float(os.getenv("PDF_PROXY_POOL_TIMEOUT_SECONDS", "10"))),
+    )
+    # Warm up in the background so the server starts accepting connections right away
+    warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    feed_refresh_task = None
+    if FEEDS_ENABLED:
+        if paper_store.available:
+            feed_refresh_task = asyncio.create_task(refresh_feeds_periodically())
+        else:
+            print("Feeds are enabled but MONGO_URI is not set, so feed candidates can't be resolved; not refreshing feeds")
+    yield
+    if feed_refresh_task is not None:
+        feed_refresh_task.cancel()
+    pdf_downloader.cancel_all()
+    await pdf_client.aclose()
+    scoring_pool.shutdown()
+    paper_store.close()
+    if feed_store is not None:
+        feed_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,9 +167,14 @@ app.add_middleware(
         os.getenv("BACKEND_URL", "http://localhost:3000")], 
     allow_credentials=True,
     allow_methods=["GET", "POST"], 
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "Range"],
+    # Lets the PDF viewer read range metadata from /proxy-pdf responses
+    expose_headers=["Content-Length", "Content-Range", "Accept-Ranges", "Server-Timing"],
 )
 
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 class Paper(BaseModel):
     paperId: str = Field(..., description="Paper ID from the semantic scholar API")
     title: str = Field(..., description="Title of the paper")
@@ -36,30 +190,157 @@ class User(BaseModel):
 
 class PaperRecommendationRequest(BaseModel):
     user_interests: List[str] = Field(..., description="List of user interests as strings")
-    papers: List[Paper] = Field(..., description="List of papers with their fields of study")
+    papers: List[Paper] = Field(default=[], description="List of papers with their fields of study")
     saved_papers: List[Paper] = Field(default=[], description="User's saved papers for content-based filtering")
+    paper_ids: List[str] = Field(default=[], description="Candidate papers by paperId, resolved from the papers collection and appended after papers")
+    saved_paper_ids: List[str] = Field(default=[], description="Saved papers by paperId, resolved from the papers collection")
     
+def check_parallel_save_lists(model: BaseModel, save_lists) -> None:
+    """Each per-save weights or saved_at list must have one entry per saved paper, across the lists it covers."""
+    for saved_fields, parallel_fields in save_lists:
+        expected = sum(len(getattr(model, field)) for field in saved_fields)
+        for parallel_field in parallel_fields:
+            values = getattr(model, parallel_field)
+            if values is not None and len(values) != expected:
+                raise ValueError(f"{parallel_field} must have one entry per item of {' and '.join(saved_fields)}")
+
 class HybridRecommendationRequest(BaseModel):
     user_interests: List[str] = Field(..., description="List of user interests as strings")
-    papers: List[Paper] = Field(..., description="List of papers with their fields of study")
+    papers: List[Paper] = Field(default=[], description="List of papers with their fields of study")
     saved_papers: List[Paper] = Field(default=[], description="User's saved papers for content-based filtering")
     followers_saved_papers: List[Paper] = Field(default=[], description="Papers saved by user's followers")
     similar_users_saved_papers: List[Paper] = Field(default=[], description="Papers saved by similar users")
+    paper_ids: List[str] = Field(default=[], description="Candidate papers by paperId, resolved from the papers collection and appended after papers")
+    saved_paper_ids: List[str] = Field(default=[], description="Saved papers by paperId, resolved from the papers collection")
+    followers_saved_paper_ids: List[str] = Field(default=[], description="Followers' saved papers by paperId, appended after followers_saved_papers")
+    similar_users_saved_paper_ids: List[str] = Field(default=[], description="Similar users' saved papers by paperId, appended after similar_users_saved_papers")
+    followers_saved_weights: Optional[List[NonNegativeFloat]] = Field(None, description="Optional non-negative weight per followers' saved paper (papers then IDs), e.g. the saving follower's affinity")
+    similar_users_saved_weights: Optional[List[NonNegativeFloat]] = Field(None, description="Optional non-negative weight per similar users' saved paper (papers then IDs)")
+    followers_saved_at: Optional[List[Optional[datetime]]] = Field(None, description="Optional save time per followers' saved paper (papers then IDs), used for time decay")
+    similar_users_saved_at: Optional[List[Optional[datetime]]] = Field(None, description="Optional save time per similar users' saved paper (papers then IDs), used for time decay")
+    save_decay_half_life_days: Optional[float] = Field(None, gt=0, description="Half-life in days for decaying older saves; no decay when unset")
+    
+    @model_validator(mode="after")
+    def check_parallel_lists(self):
+        check_parallel_save_lists(self, (
+            (("followers_saved_papers", "followers_saved_paper_ids"), ("followers_saved_weights", "followers_saved_at")),
+            (("similar_users_saved_papers", "similar_users_saved_paper_ids"), ("similar_users_saved_weights", "similar_users_saved_at")),
+        ))
+        return self
     
 class UserRecommendationRequest(BaseModel):
     user_interests: List[str] = Field(..., description="List of user interests as strings")
     users: List[User] = Field(..., description="List of users with their interests and other metadata")
     
+class UserInterestsUpdate(BaseModel):
+    interests: List[str] = Field(..., description="The user's current list of interests")
+
+class SimilarUsersRequest(BaseModel):
+    user_interests: List[str] = Field(default=[], description="Interests to match; defaults to the indexed interests of user_id")
+    user_id: Optional[str] = Field(None, description="ID of the requesting user, excluded from the results")
+    n: int = Field(default=10, gt=0, description="Number of similar users to return")
+    exclude_user_ids: List[str] = Field(default=[], description="Additional user IDs to leave out (e.g. already followed)")
+
+class SimilarUser(BaseModel):
+    userId: str = Field(..., description="ID of the matching user")
+    score: float = Field(..., description="Cosine similarity of the user's interests")
+
+class SimilarUsersResponse(BaseModel):
+    results: List[SimilarUser] = Field(..., description="Most similar users, best first")
+    total_users: int = Field(..., description="Total number of users in the index")
+
 class RecommendationResponse(BaseModel):
     similarities: List[float] = Field(..., description="List of similarity scores for each paper")
     total_items: int = Field(..., description="Total number of items considered for recommendation")
     content_scores: Optional[List[float]] = Field(None, description="Content-based filtering scores")
     collaborative_scores: Optional[List[float]] = Field(None, description="Collaborative filtering scores")
 
+class TopKPaperRecommendationRequest(PaperRecommendationRequest):
+    k: int = Field(..., gt=0, description="Number of top-ranked papers to return")
+    include_components: bool = Field(default=False, description="Also return the component scores of the returned papers")
+
+class TopKHybridRecommendationRequest(HybridRecommendationRequest):
+    k: int = Field(..., gt=0, description="Number of top-ranked papers to return")
+    include_components: bool = Field(default=False, description="Also return the component scores of the returned papers")
+
+class RankedPaper(BaseModel):
+    paperId: str = Field(..., description="Paper ID from the semantic scholar API")
+    score: float = Field(..., description="Final recommendation score")
+    content_score: Optional[float] = Field(None, description="Content-based filtering score")
+    collaborative_score: Optional[float] = Field(None, description="Collaborative filtering score")
+
+class TopKRecommendationResponse(BaseModel):
+    results: List[RankedPaper] = Field(..., description="Top-ranked papers, best first")
+    total_items: int = Field(..., description="Total number of items considered for recommendation")
+
+class BatchUserProfile(BaseModel):
+    user_id: str = Field(..., description="ID echoed back with this user's scores")
+    user_interests: List[str] = Field(..., description="List of user interests as strings")
+    saved_papers: List[Paper] = Field(default=[], description="User's saved papers for content-based filtering")
+    saved_paper_ids: List[str] = Field(default=[], description="Saved papers by paperId, resolved from the papers collection")
+    followers_saved_paper_ids: List[str] = Field(default=[], description="IDs of papers saved by the user's followers")
+    similar_users_saved_paper_ids: List[str] = Field(default=[], description="IDs of papers saved by similar users")
+    followers_saved_weights: Optional[List[NonNegativeFloat]] = Field(None, description="Optional non-negative weight per followers' saved paper")
+    similar_users_saved_weights: Optional[List[NonNegativeFloat]] = Field(None, description="Optional non-negative weight per similar users' saved paper")
+    followers_saved_at: Optional[List[Optional[datetime]]] = Field(None, description="Optional save time per followers' saved paper, used for time decay")
+    similar_users_saved_at: Optional[List[Optional[datetime]]] = Field(None, description="Optional save time per similar users' saved paper, used for time decay")
+    save_decay_half_life_days: Optional[float] = Field(None, gt=0, description="Half-life in days for decaying older saves; no decay when unset")
+    
+    @model_validator(mode="after")
+    def check_parallel_lists(self):
+        check_parallel_save_lists(self, (
+            (("followers_saved_paper_ids",), ("followers_saved_weights", "followers_saved_at")),
+            (("similar_users_saved_paper_ids",), ("similar_users_saved_weights", "similar_users_saved_at")),
+        ))
+        return self
+
+class BatchHybridRecommendationRequest(BaseModel):
+    papers: List[Paper] = Field(default=[], description="Candidate papers shared by every user")
+    paper_ids: List[str] = Field(default=[], description="Candidate papers by paperId, resolved from the papers collection and appended after papers")
+    users: List[BatchUserProfile] = Field(..., description="Profiles to score the candidates for")
+    k: Optional[int] = Field(None, gt=0, description="Only return each user's k best papers instead of every score")
+
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until warm_up() has finished."""
+    if not startup_state["ready"]:
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"status": "ready", "ready_after_seconds": startup_state["ready_after_seconds"]}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage duration and input size histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/paper-vector-cache")
+async def paper_vector_cache_stats():
+    """Hit/miss counters for the paper vector cache."""
+    return paper_vector_cache.stats()
+
+@app.get("/scoring-pool")
+async def scoring_pool_stats():
+    """Load and rejection counters for the scoring pool."""
+    return scoring_pool.stats()
+
+@app.get("/pdf-cache")
+async def pdf_cache_stats():
+    """Hit ratio, revalidation and bytes-saved counters for the /proxy-pdf disk cache."""
+    return pdf_cache.stats()
+
+@app.get("/response-cache")
+async def response_cache_stats():
+    """Hit, coalescing and eviction counters for the recommendation response cache."""
+    return response_cache.stats()
+
+@app.get("/paper-store")
+async def paper_store_stats():
+    """Hit/miss counters for the paperId -> paper lookup cache."""
+    return paper_store.stats()
+
 def calculate_recency_score(publication_year: Optional[int], max_boost: float = 0.15) -> float:
     """Calculate recency boost score based on publication year."""
     if not publication_year:
@@ -72,88 +353,195 @@ def calculate_recency_score(publication_year: Optional[int], max_boost: float =
     else:
         return max(0, max_boost * (5 - years_old) * 0.2)
 
-def calculate_content_based_scores(user_interests: List[str], papers: List[Paper], saved_papers: List[Paper] = None) -> List[float]:
-    """Calculate content-based filtering scores using user interests and saved papers."""
-    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+def calculate_recency_scores(publication_years: np.ndarray, max_boost: float = 0.15) -> np.ndarray:
+    """Vectorized calculate_recency_score over a column of publication years (0 or NaN when unknown)."""
+    publication_years = np.nan_to_num(np.asarray(publication_years, dtype=float))
+    years_old = datetime.now().year - publication_years
+    boosts = np.where(years_old < 0, max_boost, np.maximum(0, max_boost * (5 - years_old) * 0.2))
+    return np.where(publication_years != 0, boosts, 0.0)
+
+def apply_score_boosts(similarities: np.ndarray, open_access_boosts: np.ndarray, recency_boosts: np.ndarray) -> np.ndarray:
+    """Add the open-access and recency boosts to the similarities, clipping each step at 1.0."""
+    similarities = np.asarray(similarities, dtype=float)
+    # Papers without open access keep their raw similarity, only boosted ones are clipped
+    boosted = np.where(open_access_boosts > 0, np.minimum(similarities + open_access_boosts, 1.0), similarities)
+    return np.minimum(boosted + recency_boosts, 1.0)
+
+def blend_scores(content_scores: np.ndarray, collaborative_scores: np.ndarray, content_weight: float, collaborative_weight: float) -> np.ndarray:
+    """Weighted blend of content and collaborative scores."""
+    return (np.asarray(content_scores, dtype=float) * content_weight) + (np.asarray(collaborative_scores, dtype=float) * collaborative_weight)
+
+def paper_content_hash(paper: Paper, text: str) -> str:
+    """Hash everything a cached paper vector and its boosts are derived from."""
+    open_access_url = paper.openAccessPdf.get("url") if paper.openAccessPdf else None
+    return hashlib.sha1(f"{text}\x00{open_access_url}\x00{paper.year}".encode("utf-8")).hexdigest()
+
+def stack_vectors(vectors: List[Any], n_features: int) -> "csr_matrix":
+    """Stack single-row CSR vectors into one matrix (much faster than scipy's vstack for many rows)."""
+    from scipy.sparse import csr_matrix
+
+    indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([vector.nnz for vector in vectors])
+    if not vectors:
+        return csr_matrix((0, n_features))
+    indices = np.concatenate([vector.indices for vector in vectors])
+    data = np.concatenate([vector.data for vector in vectors])
+    return csr_matrix((data, indices, indptr), shape=(len(vectors), n_features))
+
+def vectorize_papers(papers: List[Paper], query_texts: List[str]) -> Tuple[Optional["csr_matrix"], List[CachedPaperVector]]:
+    """
+    Vectorize the query texts and look up the papers in the vector cache.
+    
+    Only cache misses are vectorized, together with the query texts in one batched transform, so
+    every returned vector comes from the same vocabulary. Returns the query matrix (None while the
+    corpus has no vocabulary) and one cache entry per paper.
+    """
+    boost_year = datetime.now().year
+    corpus_version = paper_corpus.version
+    
+    entries: List[Optional[CachedPaperVector]] = [None] * len(papers)
+    misses: Dict[Tuple[str, str], List[int]] = {}
+    miss_texts: Dict[Tuple[str, str], str] = {}
+    for i, paper in enumerate(papers):
+        text = paper_text(paper.fieldsOfStudy, paper.abstract, paper.title)
+        content_hash = paper_content_hash(paper, text)
+        entry = paper_vector_cache.get(paper.paperId, content_hash, corpus_version, boost_year)
+        if entry is not None:
+            entries[i] = entry
+        else:
+            key = (paper.paperId, content_hash)
+            misses.setdefault(key, []).append(i)
+            miss_texts[key] = text
     
+    if miss_texts:
+        # New papers feed the next background refit of the corpus vocabulary
+        paper_corpus.add_documents({paper_id: text for (paper_id, _), text in miss_texts.items()})
+    
+    if not paper_corpus.is_fitted:
+        query_matrix, miss_matrix, used_version = None, None, None
+    else:
+        miss_keys = list(miss_texts)
+        matrix, used_version = paper_corpus.transform(query_texts + [miss_texts[key] for key in miss_keys])
+        if used_version != corpus_version and len(misses) < len(papers):
+            # The corpus was refitted mid-request, cached vectors from the old vocabulary cannot be mixed in
+            return vectorize_papers(papers, query_texts)
+        query_matrix, miss_matrix = matrix[:len(query_texts)], matrix[len(query_texts):]
+    
+    miss_papers = [papers[indices[0]] for indices in misses.values()]
+    recency_boosts = calculate_recency_scores([paper.year or 0 for paper in miss_papers]).tolist()
+    for row, (key, indices) in enumerate(misses.items()):
+        paper = miss_papers[row]
+        entry = CachedPaperVector(
+            content_hash=key[1],
+            corpus_version=used_version,
+            boost_year=boost_year,
+            vector=miss_matrix[row] if miss_matrix is not None else None,
+            open_access_boost=OPEN_ACCESS_BOOST if paper.openAccessPdf and paper.openAccessPdf.get("url") else 0.0,
+            recency_boost=recency_boosts[row],
+        )
+        if entry.vector is not None:
+            paper_vector_cache.put(key[0], entry)
+        for i in indices:
+            entries[i] = entry
+    
+    return query_matrix, entries
+
+def user_profile_text(user_interests: List[str], saved_papers: Optional[List[Paper]]) -> Tuple[Optional[str], Dict[str, str]]:
+    """The text a user is matched on (interests, then saved papers) or None without either, plus the saved papers' texts."""
     user_profile_parts = []
     
     if user_interests:
         user_profile_parts.append(" ".join(user_interests))
     
+    saved_paper_texts = {}
     if saved_papers:
         for paper in saved_papers:
-            paper_content = []
-            if paper.fieldsOfStudy:
-                paper_content.extend(paper.fieldsOfStudy)
-            if paper.abstract:
-                paper_content.append(paper.abstract)
-            if paper.title:
-                paper_content.append(paper.title)
-            if paper_content:
-                user_profile_parts.append(" ".join(paper_content))
+            saved_paper_text = paper_text(paper.fieldsOfStudy, paper.abstract, paper.title)
+            if saved_paper_text:
+                user_profile_parts.append(saved_paper_text)
+                saved_paper_texts[paper.paperId] = saved_paper_text
     
     if not user_profile_parts:
-        return [0.0] * len(papers)
-    
-    user_profile = " ".join(user_profile_parts)
+        return None, saved_paper_texts
+    return " ".join(user_profile_parts), saved_paper_texts
+
+def calculate_content_based_scores(user_interests: List[str], papers: List[Paper], saved_papers: List[Paper] = None) -> List[float]:
+    """Calculate content-based filtering scores using user interests and saved papers."""
+    with metrics.stage("profile_text"):
+        user_profile, saved_paper_texts = user_profile_text(user_interests, saved_papers)
     
-    paper_contents = []
-    for paper in papers:
-        paper_content = []
-        if paper.fieldsOfStudy:
-            paper_content.extend(paper.fieldsOfStudy)
-        if paper.abstract:
-            paper_content.append(paper.abstract)
-        if paper.title:
-            paper_content.append(paper.title)
-        paper_contents.append(" ".join(paper_content))
+    if user_profile is None:
+        return [0.0] * len(papers)
     
-    all_text = [user_profile] + paper_contents
-    tfidf_matrix = vectorizer.fit_transform(all_text)
+    with metrics.stage("vectorize"):
+        user_vector, paper_entries = vectorize_papers(papers, [user_profile])
+        paper_corpus.add_documents(saved_paper_texts)
     
-    user_vector = tfidf_matrix[0:1]
-    paper_vectors = tfidf_matrix[1:]
-
-    similarities = cosine_similarity(user_vector, paper_vectors)[0]
+    with metrics.stage("cosine_similarity"):
+        if user_vector is not None and papers:
+            paper_vectors = stack_vectors([entry.vector for entry in paper_entries], user_vector.shape[1])
+            from sklearn.metrics.pairwise import cosine_similarity
+            similarities = cosine_similarity(user_vector, paper_vectors)[0]
+        else:
+            similarities = np.zeros(len(papers))
     
-    OPEN_ACCESS_BOOST = 0.2
-    boosted_similarities = []
-    for i, paper in enumerate(papers):
-        base_similarity = similarities[i]
-        
-        if paper.openAccessPdf and paper.openAccessPdf.get("url"):
-            base_similarity = min(base_similarity + OPEN_ACCESS_BOOST, 1.0)
-        
-        recency_boost = calculate_recency_score(paper.year)
-        base_similarity = min(base_similarity + recency_boost, 1.0)
+    with metrics.stage("boosts"):
+        open_access_boosts = np.fromiter((entry.open_access_boost for entry in paper_entries), dtype=float, count=len(papers))
+        recency_boosts = np.fromiter((entry.recency_boost for entry in paper_entries), dtype=float, count=len(papers))
         
-        boosted_similarities.append(base_similarity)
+        return apply_score_boosts(similarities, open_access_boosts, recency_boosts).tolist()
+
+def calculate_save_weights(weights: Optional[List[float]], saved_at: Optional[List[Optional[datetime]]], half_life_days: Optional[float]) -> Optional[List[float]]:
+    """Combine per-save weights with exponential time decay. Returns None when neither applies."""
+    decay = saved_at is not None and half_life_days is not None
+    if weights is None and not decay:
+        return None
     
-    return boosted_similarities
+    count = len(weights) if weights is not None else len(saved_at)
+    combined = list(weights) if weights is not None else [1.0] * count
+    if decay:
+        now = datetime.now(timezone.utc)
+        for i, timestamp in enumerate(saved_at):
+            if timestamp is None:
+                continue
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            age_days = max((now - timestamp).total_seconds() / 86400, 0.0)
+            combined[i] *= 0.5 ** (age_days / half_life_days)
+    return combined
+
+def count_saved_papers(scores: Dict[str, float], saved_paper_ids: Iterable[str], base_weight: float, weights: Optional[List[float]] = None) -> None:
+    """Add base_weight (times the per-save weight, if any) to scores for every saved paper."""
+    if weights is None:
+        for paper_id in saved_paper_ids:
+            scores[paper_id] = scores.get(paper_id, 0.0) + base_weight
+    else:
+        for paper_id, weight in zip(saved_paper_ids, weights):
+            scores[paper_id] = scores.get(paper_id, 0.0) + base_weight * weight
 
-def calculate_collaborative_scores(papers: List[Paper], followers_papers: List[Paper], similar_users_papers: List[Paper]) -> List[float]:
+def saved_paper_scores(followers_paper_ids: Iterable[str], similar_users_paper_ids: Iterable[str], followers_weights: Optional[List[float]] = None, similar_users_weights: Optional[List[float]] = None) -> Dict[str, float]:
+    """Unnormalized collaborative score per saved paperId."""
+    # One pass over the saved lists builds a paperId frequency table, followers first so each
+    # paper accumulates its weights in the same order as a per-paper scan would
+    saved_scores: Dict[str, float] = {}
+    count_saved_papers(saved_scores, followers_paper_ids, 1.0, followers_weights)
+    # Similar users' papers are weighted slightly less
+    count_saved_papers(saved_scores, similar_users_paper_ids, 0.7, similar_users_weights)
+    return saved_scores
+
+def calculate_collaborative_scores(papers: List[Paper], followers_papers: List[Paper], similar_users_papers: List[Paper], followers_weights: Optional[List[float]] = None, similar_users_weights: Optional[List[float]] = None) -> List[float]:
     """Calculate collaborative filtering scores based on followers and similar users."""
     if not papers:
         return []
     
-    paper_scores = {}
+    saved_scores = saved_paper_scores(
+        (paper.paperId for paper in followers_papers),
+        (paper.paperId for paper in similar_users_papers),
+        followers_weights,
+        similar_users_weights,
+    )
     
-    for paper in papers:
-        paper_id = paper.paperId
-        score = 0.0
-        
-        # Check followers' papers
-        for follower_paper in followers_papers:
-            if follower_paper.paperId == paper_id:
-                score += 1.0
-        
-        # Check similar users' papers (weighted slightly less)
-        for similar_user_paper in similar_users_papers:
-            if similar_user_paper.paperId == paper_id:
-                score += 0.7
-        
-        paper_scores[paper_id] = score
+    paper_scores = {paper.paperId: saved_scores.get(paper.paperId, 0.0) for paper in papers}
     
     max_score = max(paper_scores.values()) if paper_scores.values() else 1.0
     if max_score > 0:
@@ -163,24 +551,153 @@ def calculate_collaborative_scores(papers: List[Paper], followers_papers: List[P
     
     return normalized_scores
 
-@app.post("/recommend-papers", response_model=RecommendationResponse)
-async def recommend_papers(request: PaperRecommendationRequest):
-    """Original content-based recommendation using only user interests. Only used as fallback."""
-    content_scores = calculate_content_based_scores(
+def resolved_candidates(paper_ids: List[str], resolved: Dict[str, Dict[str, Any]]) -> List[Paper]:
+    """Candidate papers from a paper_store.get_many result; unknown ones become empty papers to keep scores aligned."""
+    return [
+        Paper(**resolved[paper_id]) if paper_id in resolved else Paper(paperId=paper_id, title="", fieldsOfStudy=[])
+        for paper_id in paper_ids
+    ]
+
+def resolved_saved_papers(paper_ids: List[str], resolved: Dict[str, Dict[str, Any]]) -> List[Paper]:
+    """Saved papers from a paper_store.get_many result; unknown ones are skipped."""
+    return [Paper(**resolved[paper_id]) for paper_id in paper_ids if paper_id in resolved]
+
+def resolve_paper_references(request: Union[PaperRecommendationRequest, HybridRecommendationRequest]) -> None:
+    """
+    Replace paperId references in the request with Paper objects, in place.
+    
+    Candidate and saved papers are fetched from the paper store in one bulk lookup. Unknown
+    candidates become empty papers so scores stay aligned with the request order, unknown saved
+    papers are skipped. Followers' and similar users' papers only need their ID for collaborative
+    scoring, so they are never fetched.
+    """
+    if isinstance(request, HybridRecommendationRequest):
+        request.followers_saved_papers += [Paper.model_construct(paperId=paper_id) for paper_id in request.followers_saved_paper_ids]
+        request.similar_users_saved_papers += [Paper.model_construct(paperId=paper_id) for paper_id in request.similar_users_saved_paper_ids]
+        request.followers_saved_paper_ids = []
+        request.similar_users_saved_paper_ids = []
+    
+    if not request.paper_ids and not request.saved_paper_ids:
+        return
+    
+    try:
+        resolved = paper_store.get_many(request.paper_ids + request.saved_paper_ids)
+    except PaperStoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Cannot resolve paper IDs: {e}")
+    
+    request.papers += resolved_candidates(request.paper_ids, resolved)
+    request.saved_papers += resolved_saved_papers(request.saved_paper_ids, resolved)
+    request.paper_ids = []
+    request.saved_paper_ids = []
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first (ties keep input order), via partial selection.
+    Same as np.argsort(-scores, kind="stable")[:k]: argpartition alone picks arbitrary items among
+    those tied with the k-th score, which is common with zero similarities and equal boosts.
+    """
+    scores = np.asarray(scores, dtype=float)
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > kth)
+    # Fill the remaining slots from the tied scores with the lowest indices
+    tied = np.flatnonzero(scores == kth)[:k - len(above)]
+    candidates = np.concatenate((above, tied))
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+def rank_papers(papers: List[Paper], scores: List[float], k: int, content_scores: Optional[List[float]] = None, collaborative_scores: Optional[List[float]] = None) -> List[RankedPaper]:
+    """Build the top-k RankedPaper list, attaching component scores only for the returned papers."""
+    ranked = []
+    for i in top_k_indices(scores, k).tolist():
+        ranked.append(RankedPaper(
+            paperId=papers[i].paperId,
+            score=scores[i],
+            content_score=content_scores[i] if content_scores is not None else None,
+            collaborative_score=collaborative_scores[i] if collaborative_scores is not None else None,
+        ))
+    return ranked
+
+async def run_scoring(fn, *args):
+    """Run a scoring function on the scoring pool, mapping saturation and timeouts to HTTP errors."""
+    try:
+        return await scoring_pool.run(fn, *args)
+    except ScoringPoolSaturated:
+        raise HTTPException(status_code=429, detail="Recommendation service is busy, retry shortly", headers={"Retry-After": "1"})
+    except ScoringTimeout:
+        raise HTTPException(status_code=504, detail="Recommendation scoring timed out")
+
+def observe_input_sizes(request: Union[PaperRecommendationRequest, HybridRecommendationRequest]) -> None:
+    if not metrics.enabled:
+        return
+    metrics.observe_size("papers", len(request.papers))
+    metrics.observe_size("saved_papers", len(request.saved_papers))
+    if isinstance(request, HybridRecommendationRequest):
+        metrics.observe_size("followers_saved_papers", len(request.followers_saved_papers))
+        metrics.observe_size("similar_users_saved_papers", len(request.similar_users_saved_papers))
+    metrics.observe_size("vocabulary", paper_corpus.vocabulary_size)
+
+async def cached_response(route: str, request: BaseModel, compute, *state: Any) -> Response:
+    """
+    Serve a recommendation from the response cache, keyed by the route, the canonical request body
+    (validated model, so key order, whitespace and omitted defaults don't matter) and any server
+    state the scores depend on. compute() returns the response model on a miss.
+    """
+    # Fingerprint before scoring, which resolves paper references into the request in place
+    key = response_cache.fingerprint(route, *state, request.model_dump_json())
+    
+    async def compute_body() -> bytes:
+        response = await compute()
+        return response.model_dump_json().encode("utf-8")
+    
+    body = await response_cache.get_or_compute(key, compute_body)
+    return Response(content=body, media_type="application/json")
+
+def calculate_paper_scores(request: PaperRecommendationRequest) -> List[float]:
+    """Content-based scores for a paper recommendation request."""
+    with metrics.stage("resolve_references"):
+        resolve_paper_references(request)
+    observe_input_sizes(request)
+    return calculate_content_based_scores(
         request.user_interests, 
         request.papers, 
         request.saved_papers
     )
+
+@app.post("/recommend-papers", response_model=RecommendationResponse)
+async def recommend_papers(request: PaperRecommendationRequest):
+    """Original content-based recommendation using only user interests. Only used as fallback."""
+    metrics.checkpoint("validation")
     
-    return RecommendationResponse(
-        similarities=content_scores,
-        total_items=len(request.papers),
-        content_scores=content_scores
-    )
+    async def compute():
+        content_scores = await run_scoring(calculate_paper_scores, request)
+        metrics.checkpoint("scoring")
+        
+        return RecommendationResponse(
+            similarities=content_scores,
+            total_items=len(request.papers),
+            content_scores=content_scores
+        )
+    
+    # A corpus refit changes every content score
+    return await cached_response("/recommend-papers", request, compute, paper_corpus.version)
 
-@app.post("/hybrid-recommend-papers", response_model=RecommendationResponse)
-async def hybrid_recommend_papers(request: HybridRecommendationRequest):
-    """Hybrid recommendation combining content-based and collaborative filtering."""
+@app.post("/recommend-papers/top-k", response_model=TopKRecommendationResponse)
+async def recommend_papers_top_k(request: TopKPaperRecommendationRequest):
+    """Content-based recommendation returning only the top-k paper IDs, ranked server-side."""
+    metrics.checkpoint("validation")
+    content_scores = await run_scoring(calculate_paper_scores, request)
+    metrics.checkpoint("scoring")
+    
+    results = rank_papers(request.papers, content_scores, request.k, content_scores if request.include_components else None)
+    
+    return TopKRecommendationResponse(results=results, total_items=len(request.papers))
+
+def calculate_hybrid_scores(request: HybridRecommendationRequest) -> Tuple[np.ndarray, List[float], List[float]]:
+    """Hybrid scores combining content-based and collaborative filtering, plus both component scores."""
+    with metrics.stage("resolve_references"):
+        resolve_paper_references(request)
+    observe_input_sizes(request)
     
     content_scores = calculate_content_based_scores(
         request.user_interests, 
@@ -188,19 +705,28 @@ async def hybrid_recommend_papers(request: HybridRecommendationRequest):
         request.saved_papers
     )
     
-    collaborative_scores = calculate_collaborative_scores(
-        request.papers,
-        request.followers_saved_papers,
-        request.similar_users_saved_papers
-    )
+    with metrics.stage("collaborative"):
+        collaborative_scores = calculate_collaborative_scores(
+            request.papers,
+            request.followers_saved_papers,
+            request.similar_users_saved_papers,
+            calculate_save_weights(request.followers_saved_weights, request.followers_saved_at, request.save_decay_half_life_days),
+            calculate_save_weights(request.similar_users_saved_weights, request.similar_users_saved_at, request.save_decay_half_life_days),
+        )
     
-    content_weight = 0.7
-    collaborative_weight = 0.3
+    content_weight, collaborative_weight = hybrid_weights(
+        len(request.saved_papers) > 0,
+        len(request.followers_saved_papers) > 0,
+        len(request.similar_users_saved_papers) > 0,
+    )
     
-    has_saved_papers = len(request.saved_papers) > 0
-    has_followers_data = len(request.followers_saved_papers) > 0
-    has_similar_users_data = len(request.similar_users_saved_papers) > 0
+    with metrics.stage("blend"):
+        hybrid_scores = blend_scores(content_scores, collaborative_scores, content_weight, collaborative_weight)
     
+    return hybrid_scores, content_scores, collaborative_scores
+
+def hybrid_weights(has_saved_papers: bool, has_followers_data: bool, has_similar_users_data: bool) -> Tuple[float, float]:
+    """Content and collaborative weights for a user, depending on which signals they have."""
     # Weights are somewhat arbitrary, but aim to balance content and collaborative scores based on available data
     # users with saved papers and followers or similar users get a balanced hybrid score
     if has_saved_papers and (has_followers_data or has_similar_users_data):
@@ -219,23 +745,409 @@ async def hybrid_recommend_papers(request: HybridRecommendationRequest):
         content_weight = 1.0
         collaborative_weight = 0.0
     
-    hybrid_scores = []
-    for i in range(len(request.papers)):
-        content_score = content_scores[i] if i < len(content_scores) else 0.0
-        collaborative_score = collaborative_scores[i] if i < len(collaborative_scores) else 0.0
+    return content_weight, collaborative_weight
+
+@app.post("/hybrid-recommend-papers", response_model=RecommendationResponse)
+async def hybrid_recommend_papers(request: HybridRecommendationRequest):
+    """Hybrid recommendation combining content-based and collaborative filtering."""
+    metrics.checkpoint("validation")
+    
+    async def compute():
+        hybrid_scores, content_scores, collaborative_scores = await run_scoring(calculate_hybrid_scores, request)
+        metrics.checkpoint("scoring")
         
-        hybrid_score = (content_score * content_weight) + (collaborative_score * collaborative_weight)
-        hybrid_scores.append(hybrid_score)
-    
-    return RecommendationResponse(
-        similarities=hybrid_scores,
-        total_items=len(request.papers),
-        content_scores=content_scores,
-        collaborative_scores=collaborative_scores
+        return RecommendationResponse(
+            similarities=hybrid_scores.tolist(),
+            total_items=len(request.papers),
+            content_scores=content_scores,
+            collaborative_scores=collaborative_scores
+        )
+    
+    return await cached_response("/hybrid-recommend-papers", request, compute, paper_corpus.version)
+
+@app.post("/hybrid-recommend-papers/top-k", response_model=TopKRecommendationResponse)
+async def hybrid_recommend_papers_top_k(request: TopKHybridRecommendationRequest):
+    """Hybrid recommendation returning only the top-k paper IDs, ranked server-side."""
+    metrics.checkpoint("validation")
+    hybrid_scores, content_scores, collaborative_scores = await run_scoring(calculate_hybrid_scores, request)
+    metrics.checkpoint("scoring")
+    
+    if request.include_components:
+        results = rank_papers(request.papers, hybrid_scores.tolist(), request.k, content_scores, collaborative_scores)
+    else:
+        results = rank_papers(request.papers, hybrid_scores.tolist(), request.k)
+    
+    return TopKRecommendationResponse(results=results, total_items=len(request.papers))
+    
+# Users scored per step of /hybrid-recommend-papers/batch, bounds the dense score block held at once
+BATCH_USER_BLOCK_SIZE = int(os.getenv("BATCH_USER_BLOCK_SIZE", "256"))
+
+@dataclass
+class BatchCandidates:
+    papers: List[Paper]
+    # L2-normalized profile rows (None while the corpus has no vocabulary) and transposed candidate rows
+    profile_matrix: Any
+    candidate_matrix_t: Any
+    open_access_boosts: np.ndarray
+    recency_boosts: np.ndarray
+    # paperId -> candidate indices, for collaborative counting
+    positions: Dict[str, List[int]]
+    has_profile: List[bool]
+    saved_counts: List[int]
+
+def prepare_batch(request: BatchHybridRecommendationRequest) -> BatchCandidates:
+    """
+    Resolve references and vectorize the shared candidates and every user profile in one
+    transform, so each block of users is scored with a single sparse matrix multiply.
+    """
+    saved_ids = [paper_id for user in request.users for paper_id in user.saved_paper_ids]
+    resolved = {}
+    if request.paper_ids or saved_ids:
+        # Raises PaperStoreUnavailable; the endpoints map it to a 503
+        resolved = paper_store.get_many(request.paper_ids + saved_ids)
+    papers = request.papers + resolved_candidates(request.paper_ids, resolved)
+    
+    profiles = []
+    saved_counts = []
+    saved_paper_texts = {}
+    for user in request.users:
+        saved_papers = user.saved_papers + resolved_saved_papers(user.saved_paper_ids, resolved)
+        profile, texts = user_profile_text(user.user_interests, saved_papers)
+        profiles.append(profile)
+        saved_counts.append(len(saved_papers))
+        saved_paper_texts.update(texts)
+    
+    with metrics.stage("vectorize"):
+        profile_matrix, entries = vectorize_papers(papers, [profile or "" for profile in profiles])
+        paper_corpus.add_documents(saved_paper_texts)
+    
+    candidate_matrix_t = None
+    if profile_matrix is not None:
+        from sklearn.preprocessing import normalize
+        # Same as cosine_similarity, with the candidate side normalized once for every user
+        profile_matrix = normalize(profile_matrix)
+        # No candidates leaves nothing to stack; batch_user_results then returns zero-length scores
+        if papers:
+            candidate_matrix_t = normalize(stack_vectors([entry.vector for entry in entries], profile_matrix.shape[1])).T.tocsr()
+    
+    positions: Dict[str, List[int]] = {}
+    for i, paper in enumerate(papers):
+        positions.setdefault(paper.paperId, []).append(i)
+    
+    return BatchCandidates(
+        papers=papers,
+        profile_matrix=profile_matrix,
+        candidate_matrix_t=candidate_matrix_t,
+        open_access_boosts=np.fromiter((entry.open_access_boost for entry in entries), dtype=float, count=len(papers)),
+        recency_boosts=np.fromiter((entry.recency_boost for entry in entries), dtype=float, count=len(papers)),
+        positions=positions,
+        has_profile=[profile is not None for profile in profiles],
+        saved_counts=saved_counts,
+    )
+
+def batch_collaborative_scores(batch: BatchCandidates, user: BatchUserProfile) -> np.ndarray:
+    """calculate_collaborative_scores for one user, using the shared paperId -> index map."""
+    saved_scores = saved_paper_scores(
+        user.followers_saved_paper_ids,
+        user.similar_users_saved_paper_ids,
+        calculate_save_weights(user.followers_saved_weights, user.followers_saved_at, user.save_decay_half_life_days),
+        calculate_save_weights(user.similar_users_saved_weights, user.similar_users_saved_at, user.save_decay_half_life_days),
     )
     
-@app.post("/recommend-users", response_model=RecommendationResponse)
-async def recommend_users(request: UserRecommendationRequest):
+    scores = np.zeros(len(batch.papers))
+    for paper_id, score in saved_scores.items():
+        for i in batch.positions.get(paper_id, ()):
+            scores[i] = score
+    max_score = scores.max() if len(scores) else 0.0
+    return scores / max_score if max_score > 0 else scores
+
+def batch_user_results(batch: BatchCandidates, users: List[BatchUserProfile], start: int, stop: int, k: Optional[int]) -> List[Dict[str, Any]]:
+    """Hybrid scores (or the top-k when k is given) for users[start:stop], one dict per user."""
+    with metrics.stage("batch_block"):
+        n_papers = len(batch.papers)
+        if batch.profile_matrix is not None and n_papers:
+            similarities = (batch.profile_matrix[start:stop] @ batch.candidate_matrix_t).toarray()
+        else:
+            similarities = np.zeros((stop - start, n_papers))
+        content_block = apply_score_boosts(similarities, batch.open_access_boosts, batch.recency_boosts)
+        
+        lines = []
+        for row, user in enumerate(users[start:stop]):
+            index = start + row
+            content_scores = content_block[row] if batch.has_profile[index] else np.zeros(n_papers)
+            collaborative_scores = batch_collaborative_scores(batch, user)
+            content_weight, collaborative_weight = hybrid_weights(
+                batch.saved_counts[index] > 0,
+                len(user.followers_saved_paper_ids) > 0,
+                len(user.similar_users_saved_paper_ids) > 0,
+            )
+            hybrid_scores = blend_scores(content_scores, collaborative_scores, content_weight, collaborative_weight)
+            if k is not None:
+                results = rank_papers(batch.papers, hybrid_scores.tolist(), k, content_scores.tolist(), collaborative_scores.tolist())
+                line = {"user_id": user.user_id, "results": [result.model_dump() for result in results]}
+            else:
+                line = {
+                    "user_id": user.user_id,
+                    "similarities": hybrid_scores.tolist(),
+                    "content_scores": content_scores.tolist(),
+                    "collaborative_scores": collaborative_scores.tolist(),
+                }
+            lines.append(line)
+        return lines
+
+def score_batch_block(batch: BatchCandidates, users: List[BatchUserProfile], start: int, stop: int, k: Optional[int]) -> str:
+    """Hybrid scores for users[start:stop] as NDJSON lines."""
+    return "".join(json.dumps(line) + "\n" for line in batch_user_results(batch, users, start, stop, k))
+
+@app.post("/hybrid-recommend-papers/batch")
+async def hybrid_recommend_papers_batch(request: BatchHybridRecommendationRequest):
+    """
+    Hybrid recommendations for many users over one shared candidate set, for feed precomputation.
+    Streams one NDJSON line per user, in request order, as each block of users is scored.
+    """
+    metrics.checkpoint("validation")
+    try:
+        batch = await run_scoring(prepare_batch, request)
+    except PaperStoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Cannot resolve paper IDs: {e}")
+    # Blocks are scored while streaming, after the headers (and Server-Timing) are sent
+    metrics.checkpoint("scoring")
+    
+    async def stream_scores():
+        for start in range(0, len(request.users), BATCH_USER_BLOCK_SIZE):
+            stop = min(start + BATCH_USER_BLOCK_SIZE, len(request.users))
+            # The status line is already sent, so a busy pool is waited out instead of failing the stream
+            for _ in range(100):
+                try:
+                    yield await scoring_pool.run(score_batch_block, batch, request.users, start, stop, request.k)
+                    break
+                except ScoringPoolSaturated:
+                    await asyncio.sleep(0.05)
+                except ScoringTimeout:
+                    yield json.dumps({"error": "Recommendation scoring timed out", "user_index": start}) + "\n"
+                    return
+            else:
+                yield json.dumps({"error": "Recommendation service is busy", "user_index": start}) + "\n"
+                return
+    
+    return StreamingResponse(stream_scores(), media_type="application/x-ndjson")
+
+class FeedProfileUpdate(BaseModel):
+    interests: Optional[List[str]] = Field(None, description="The user's interests")
+    saved_paper_ids: Optional[List[str]] = Field(None, description="paperIds of the user's saved papers")
+    following: Optional[List[str]] = Field(None, description="IDs of the users this user follows")
+
+class FeedCandidatesUpdate(BaseModel):
+    paper_ids: List[str] = Field(..., description="Candidate papers every feed is ranked from, by paperId")
+
+class FeedEvent(BaseModel):
+    type: Literal["save", "unsave", "follow", "unfollow", "new_papers"] = Field(..., description="What changed")
+    user_id: Optional[str] = Field(None, description="User who saved or followed")
+    paper_id: Optional[str] = Field(None, description="Saved or unsaved paper, for save events")
+    followed_user_id: Optional[str] = Field(None, description="Followed or unfollowed user, for follow events")
+    paper_ids: List[str] = Field(default=[], description="New candidate papers, for new_papers events")
+
+    @model_validator(mode="after")
+    def check_event_fields(self):
+        required = {
+            "save": ("user_id", "paper_id"),
+            "unsave": ("user_id", "paper_id"),
+            "follow": ("user_id", "followed_user_id"),
+            "unfollow": ("user_id", "followed_user_id"),
+            "new_papers": ("paper_ids",),
+        }[self.type]
+        missing = [field for field in required if not getattr(self, field)]
+        if missing:
+            raise ValueError(f"{self.type} events require {', '.join(missing)}")
+        return self
+
+class FeedResponse(BaseModel):
+    user_id: str = Field(..., description="User the feed belongs to")
+    results: List[RankedPaper] = Field(..., description="Top-ranked papers, best first")
+    computed_at: float = Field(..., description="Unix time the feed was computed")
+    staleness_seconds: float = Field(..., description="How long the user's inputs have changed without the feed being recomputed")
+    source: Literal["store", "live"] = Field(..., description="Served from the feed store or scored on a miss")
+
+def compute_feeds(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Score and store the feeds of the given users with the batch scorer. Returns the new feeds by user ID."""
+    store = get_feed_store()
+    # Changes after this point invalidate the feeds computed here
+    computed_at = time.time()
+    records = store.get_users(user_ids)
+    
+    # Followers' saved papers are the saves of the users someone follows (as in the Node backend)
+    followed = store.get_users({followed_id for record in records.values() for followed_id in record["profile"]["following"]})
+    similar_ids = {
+        user_id: [similar_id for similar_id, _ in user_index.query(record["profile"]["interests"], n=50, exclude=[user_id])]
+        for user_id, record in records.items()
+    }
+    similar = store.get_users({similar_id for ids in similar_ids.values() for similar_id in ids})
+    
+    profiles = []
+    depends_on = {}
+    for user_id, record in records.items():
+        profile = record["profile"]
+        # Up to 10 of the most similar users that have saved papers. The feed depends on everyone
+        # scanned, including users passed over for having no saves yet, who'd be picked after a save
+        similar_savers = []
+        depends_on[user_id] = []
+        for similar_id in similar_ids[user_id]:
+            if len(similar_savers) == 10:
+                break
+            depends_on[user_id].append(similar_id)
+            if similar_id in similar and similar[similar_id]["profile"]["saved_paper_ids"]:
+                similar_savers.append(similar[similar_id])
+        profiles.append(BatchUserProfile(
+            user_id=user_id,
+            user_interests=profile["interests"],
+            saved_paper_ids=profile["saved_paper_ids"],
+            followers_saved_paper_ids=[paper_id for followed_id in profile["following"] if followed_id in followed for paper_id in followed[followed_id]["profile"]["saved_paper_ids"]],
+            similar_users_saved_paper_ids=[paper_id for saver in similar_savers for paper_id in saver["profile"]["saved_paper_ids"]],
+        ))
+    if not profiles:
+        return {}
+    
+    batch = prepare_batch(BatchHybridRecommendationRequest(paper_ids=store.get_candidates(), users=profiles))
+    feeds = {}
+    for start in range(0, len(profiles), BATCH_USER_BLOCK_SIZE):
+        stop = min(start + BATCH_USER_BLOCK_SIZE, len(profiles))
+        for line in batch_user_results(batch, profiles, start, stop, FEED_SIZE):
+            store.put_feed(line["user_id"], line["results"], computed_at, depends_on[line["user_id"]])
+            feeds[line["user_id"]] = {"results": line["results"], "computed_at": computed_at}
+    return feeds
+
+def check_feeds_enabled() -> None:
+    if not FEEDS_ENABLED:
+        raise HTTPException(status_code=404, detail="Feeds are disabled, set FEEDS_ENABLED to use them")
+
+async def refresh_feeds_periodically():
+    """Recompute stale feeds in batches; keeps going without pausing while a full batch was stale."""
+    while True:
+        user_ids = []
+        try:
+            user_ids = await asyncio.to_thread(lambda: get_feed_store().stale_user_ids(FEED_REFRESH_BATCH_SIZE))
+            if user_ids:
+                await scoring_pool.run(compute_feeds, user_ids)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error refreshing feeds: {e!r}")
+            user_ids = []
+        if len(user_ids) < FEED_REFRESH_BATCH_SIZE:
+            await asyncio.sleep(FEED_REFRESH_INTERVAL_SECONDS)
+
+def users_interested_in(paper_ids: List[str]) -> List[str]:
+    """Users whose interests share a term with any of the papers, or every indexed user if they can't be resolved."""
+    try:
+        papers = paper_store.get_many(paper_ids)
+    except PaperStoreUnavailable:
+        return user_index.user_ids()
+    texts = [paper_text(paper["fieldsOfStudy"], paper["abstract"], paper["title"]) for paper in papers.values()]
+    return [user_id for user_id, _ in user_index.query(texts, n=len(user_index))]
+
+def users_seeing_saves_of(user_id: str) -> List[str]:
+    """Users whose feeds are computed from user_id's saves: their followers and the users who scanned them as a similar user."""
+    store = get_feed_store()
+    return list(dict.fromkeys(store.followers_of(user_id) + store.dependents_of(user_id)))
+
+def apply_profile_update(user_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a profile update and invalidate every feed computed from what changed. Returns the updated record."""
+    store = get_feed_store()
+    record = store.update_profile(user_id, **changes)
+    affected = []
+    if "saved_paper_ids" in changes or "interests" in changes:
+        affected += users_seeing_saves_of(user_id)
+    if "interests" in changes:
+        user_index.upsert(user_id, changes["interests"])
+        # Anyone sharing a term with the new interests may now rank this user among their similar users
+        affected += [similar_id for similar_id, _ in user_index.query(changes["interests"], n=len(user_index), exclude=[user_id])]
+    if affected:
+        store.invalidate(list(dict.fromkeys(affected)))
+    return record
+
+def apply_feed_event(event: FeedEvent) -> List[str]:
+    """Update the stored inputs for an event and invalidate only the affected feeds. Returns the invalidated users."""
+    store = get_feed_store()
+    if event.type in ("save", "unsave"):
+        record = store.get_user(event.user_id)
+        saved = list(record["profile"]["saved_paper_ids"]) if record else []
+        if event.type == "save" and event.paper_id not in saved:
+            saved.append(event.paper_id)
+        elif event.type == "unsave" and event.paper_id in saved:
+            saved.remove(event.paper_id)
+        store.update_profile(event.user_id, saved_paper_ids=saved)
+        affected = [event.user_id] + users_seeing_saves_of(event.user_id)
+    elif event.type in ("follow", "unfollow"):
+        record = store.get_user(event.user_id)
+        following = list(record["profile"]["following"]) if record else []
+        if event.type == "follow" and event.followed_user_id not in following:
+            following.append(event.followed_user_id)
+        elif event.type == "unfollow" and event.followed_user_id in following:
+            following.remove(event.followed_user_id)
+        store.update_profile(event.user_id, following=following)
+        affected = [event.user_id]
+    else:
+        candidates = store.get_candidates()
+        store.set_candidates(list(dict.fromkeys(candidates + event.paper_ids)))
+        affected = users_interested_in(event.paper_ids)
+    store.invalidate(affected)
+    return affected
+
+@app.put("/feeds/candidates")
+async def update_feed_candidates(update: FeedCandidatesUpdate):
+    """Replace the candidate pool feeds are ranked from; every feed is recomputed."""
+    check_feeds_enabled()
+    def replace_candidates():
+        store = get_feed_store()
+        store.set_candidates(list(dict.fromkeys(update.paper_ids)))
+        store.invalidate_all()
+    await asyncio.to_thread(replace_candidates)
+    return {"candidates": len(update.paper_ids)}
+
+@app.put("/feeds/{user_id}/profile")
+async def update_feed_profile(user_id: str, update: FeedProfileUpdate):
+    """Create or update the inputs a user's feed is computed from."""
+    check_feeds_enabled()
+    changes = update.model_dump(exclude_none=True)
+    record = await asyncio.to_thread(apply_profile_update, user_id, changes)
+    return {"user_id": user_id, "profile": record["profile"]}
+
+@app.post("/feeds/events")
+async def feed_event(event: FeedEvent):
+    """Record a save, follow or new papers and invalidate the affected feeds."""
+    check_feeds_enabled()
+    affected = await asyncio.to_thread(apply_feed_event, event)
+    return {"invalidated": len(affected)}
+
+@app.get("/feeds/{user_id}", response_model=FeedResponse)
+async def get_feed(user_id: str, k: int = Query(20, gt=0), max_staleness_seconds: float = Query(FEED_MAX_STALENESS_SECONDS, ge=0)):
+    """
+    A user's stored feed if it is at most max_staleness_seconds behind their inputs, otherwise
+    the feed is scored live (and stored).
+    """
+    check_feeds_enabled()
+    record = await asyncio.to_thread(lambda: get_feed_store().get_user(user_id))
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"No feed profile for user {user_id}")
+    
+    feed = record["feed"]
+    if feed is not None:
+        staleness = max(0.0, time.time() - record["invalidated_at"]) if is_stale(record) else 0.0
+        if staleness <= max_staleness_seconds:
+            return FeedResponse(user_id=user_id, results=feed["results"][:k], computed_at=feed["computed_at"], staleness_seconds=staleness, source="store")
+    
+    try:
+        feeds = await run_scoring(compute_feeds, [user_id])
+    except PaperStoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Cannot resolve feed candidates: {e}")
+    feed = feeds[user_id]
+    return FeedResponse(user_id=user_id, results=feed["results"][:k], computed_at=feed["computed_at"], staleness_seconds=0.0, source="live")
+
+def calculate_user_similarities(request: UserRecommendationRequest) -> List[float]:
+    """Cosine similarity between the requesting user's interests and every other user's interests."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
     vectorizer = TfidfVectorizer()
     
     user_profile = " ".join(request.user_interests)
@@ -250,29 +1162,149 @@ async def recommend_users(request: UserRecommendationRequest):
         mentor_interests.append(interest_text)
             
     all_interests = [user_profile] + mentor_interests
-    tfidf_matrix = vectorizer.fit_transform(all_interests)
+    metrics.observe_size("users", len(request.users))
+    with metrics.stage("tfidf_fit"):
+        tfidf_matrix = vectorizer.fit_transform(all_interests)
     
     user_vector = tfidf_matrix[0:1]
     mentor_vectors = tfidf_matrix[1:]
     
-    similarities = cosine_similarity(user_vector, mentor_vectors)
+    with metrics.stage("cosine_similarity"):
+        similarities = cosine_similarity(user_vector, mentor_vectors)
     
-    return RecommendationResponse(
-        similarities=similarities[0].tolist(),
-        total_items=len(request.users)
+    return similarities[0].tolist()
+
+@app.post("/recommend-users", response_model=RecommendationResponse)
+async def recommend_users(request: UserRecommendationRequest):
+    metrics.checkpoint("validation")
+    
+    async def compute():
+        similarities = await run_scoring(calculate_user_similarities, request)
+        metrics.checkpoint("scoring")
+        
+        return RecommendationResponse(
+            similarities=similarities,
+            total_items=len(request.users)
+        )
+    
+    return await cached_response("/recommend-users", request, compute)
+
+@app.put("/users/{user_id}/interests")
+async def update_user_interests(user_id: str, update: UserInterestsUpdate):
+    """Add or refresh a user in the interest index when their profile changes."""
+    user_index.upsert(user_id, update.interests)
+    return {"userId": user_id, "total_users": len(user_index)}
+
+@app.delete("/users/{user_id}")
+async def remove_user(user_id: str):
+    """Drop a user from the interest index."""
+    user_index.remove(user_id)
+    return {"userId": user_id, "total_users": len(user_index)}
+
+@app.post("/similar-users", response_model=SimilarUsersResponse)
+async def similar_users(request: SimilarUsersRequest):
+    """Top-n users by interest similarity, served from the interest index instead of a caller-supplied user list."""
+    interests = request.user_interests
+    if not interests and request.user_id:
+        interests = user_index.interests_of(request.user_id) or []
+    
+    exclude = list(request.exclude_user_ids)
+    if request.user_id:
+        exclude.append(request.user_id)
+    
+    matches = await run_scoring(user_index.query, interests, request.n, exclude)
+    
+    return SimilarUsersResponse(
+        results=[SimilarUser(userId=user_id, score=score) for user_id, score in matches],
+        total_users=len(user_index)
+    )
+
+# Upstream response headers the PDF viewer needs for incremental (ranged) loading and caching
+PDF_PASSTHROUGH_HEADERS = ["Content-Length", "Content-Range", "Accept-Ranges", "Content-Encoding", "ETag", "Last-Modified"]
+
+def proxy_pdf_headers() -> Dict[str, str]:
+    return {
+        "Content-Disposition": f"inline; filename=proxy.pdf",
+        "Access-Control-Allow-Origin": "*",
+        "Content-Type": "application/pdf"
+    }
+
+def cached_pdf_response(entry: PdfCacheEntry) -> FileResponse:
+    """Serve a cached PDF straight from disk (sendfile, with Range support)."""
+    headers = proxy_pdf_headers()
+    if entry.etag:
+        headers["ETag"] = entry.etag
+    if entry.last_modified:
+        headers["Last-Modified"] = entry.last_modified
+    return FileResponse(pdf_cache.body_path(entry), headers=headers, media_type="application/pdf")
+
+async def proxy_pdf_range(url: str, range_header: str):
+    """Relay a ranged request upstream, for ranges asked for before the full PDF is cached."""
+    try:
+        response = await pdf_client.send(pdf_client.build_request("GET", url, headers={"Range": range_header}), stream=True)
+    except httpx.PoolTimeout:
+        raise HTTPException(status_code=503, detail="Too many concurrent PDF downloads, retry shortly", headers={"Retry-After": "1"})
+    
+    if response.status_code not in (200, 206):
+        await response.aclose()
+        return {"error": "Failed to fetch PDF", "status_code": response.status_code}
+    
+    headers = proxy_pdf_headers()
+    for header in PDF_PASSTHROUGH_HEADERS:
+        if header in response.headers:
+            headers[header] = response.headers[header]
+    
+    # Stream the raw upstream body chunk by chunk and release the connection once it's sent
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=headers,
+        media_type="application/pdf",
+        background=BackgroundTask(response.aclose)
     )
 
 @app.get("/proxy-pdf")
-async def proxy_pdf(url: str):
+async def proxy_pdf(url: str, request: Request):
     """Needed to avoid CORS issues when fetching PDFs from semantic scholar API for rendering in the frontend."""
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        response = await client.get(url)
-        if response.status_code == 200:
-            headers = {
-                "Content-Disposition": f"inline; filename=proxy.pdf",
-                "Access-Control-Allow-Origin": "*",
-                "Content-Type": "application/pdf"
-            }
-            return StreamingResponse(response.iter_bytes(), headers=headers, media_type="application/pdf")
-        else:
-            return {"error": "Failed to fetch PDF", "status_code": response.status_code}
\ No newline at end of file
+    entry = pdf_cache.lookup(url)
+    if entry is not None and not pdf_cache.needs_revalidation(entry):
+        pdf_cache.record_hit(entry, range_length(request.headers.get("range"), entry.size))
+        return cached_pdf_response(entry)
+    
+    # Missing or stale: fill the cache with a full download that outlives this request
+    download = pdf_downloader.start(pdf_client, url, entry)
+    try:
+        status_code = await asyncio.shield(download.started)
+    except Exception as e:
+        if entry is not None:
+            # Upstream unreachable, a stale copy beats an error (it saved nothing though)
+            pdf_cache.record_hit(entry, 0)
+            return cached_pdf_response(entry)
+        if isinstance(e, httpx.PoolTimeout):
+            raise HTTPException(status_code=503, detail="Too many concurrent PDF downloads, retry shortly", headers={"Retry-After": "1"})
+        raise
+    
+    if status_code == 304 and download.entry is not None:
+        # Not modified: upstream didn't send the body again
+        pdf_cache.record_hit(download.entry, range_length(request.headers.get("range"), download.entry.size))
+        return cached_pdf_response(download.entry)
+    if status_code != 200:
+        if entry is not None:
+            # An upstream error with a stale copy to fall back on
+            pdf_cache.record_hit(entry, 0)
+            return cached_pdf_response(entry)
+        return {"error": "Failed to fetch PDF", "status_code": status_code}
+    
+    if download.entry is not None:
+        # Finished while we waited, ranges included are served from disk
+        return cached_pdf_response(download.entry)
+    if "range" in request.headers:
+        # The viewer's ranged reads go upstream until the full download lands in the cache
+        return await proxy_pdf_range(url, request.headers["range"])
+    if download.done:
+        raise HTTPException(status_code=502, detail="PDF download failed")
+    
+    headers = proxy_pdf_headers()
+    headers.update(download.headers)
+    headers["Accept-Ranges"] = "bytes"
+    return StreamingResponse(pdf_downloader.follow(download, open(download.path, "rb")), headers=headers, media_type="application/pdf")
@@ -0,0 +1,179 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import List, Dict, Tuple, Optional, Iterator
+import bisect
+import threading
+import time
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+class RequestTimings:
+    """Stages recorded while handling one request, for the Server-Timing header."""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self.last_checkpoint = time.perf_counter()
+
+# Set by MetricsMiddleware; copied into scoring threads by ScoringPool
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+_disabled_stage = nullcontext()
+
+class Metrics:
+    """
+    Hot-path instrumentation: per-stage duration and input size histograms for /metrics,
+    and optionally a Server-Timing header per response.
+
+    When disabled, stage() returns a shared no-op context manager and the other recording
+    methods return immediately, so instrumented code pays a single attribute check.
+    """
+
+    def __init__(self, enabled: bool = False, server_timing: bool = False):
+        self.enabled = enabled
+        self.server_timing = enabled and server_timing
+        self._durations: Dict[str, Histogram] = {}
+        self._sizes: Dict[str, Histogram] = {}
+        self._requests: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str):
+        """Context manager timing one stage of the current request."""
+        if not self.enabled:
+            return _disabled_stage
+        return self._timed_stage(name)
+
+    @contextmanager
+    def _timed_stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._durations.get(name)
+            if histogram is None:
+                histogram = self._durations[name] = Histogram(DURATION_BUCKETS)
+            histogram.observe(seconds)
+        timings = request_timings.get()
+        if timings is not None:
+            timings.stages.append((name, seconds))
+
+    def checkpoint(self, name: str) -> None:
+        """Record the time since the request started (or the previous checkpoint) as a stage."""
+        if not self.enabled:
+            return
+        timings = request_timings.get()
+        if timings is None:
+            return
+        now = time.perf_counter()
+        self.record_stage(name, now - timings.last_checkpoint)
+        timings.last_checkpoint = now
+
+    def observe_size(self, name: str, value: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._sizes.get(name)
+            if histogram is None:
+                histogram = self._sizes[name] = Histogram(SIZE_BUCKETS)
+            histogram.observe(value)
+
+    def record_request(self, method: str, route: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._requests.get((method, route))
+            if histogram is None:
+                histogram = self._requests[(method, route)] = Histogram(DURATION_BUCKETS)
+            histogram.observe(seconds)
+
+    def render(self) -> str:
+        """All histograms in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for metric, help_text, histograms in (
+                ("research4all_request_duration_seconds", "Request duration by route.", self._requests),
+                ("research4all_stage_duration_seconds", "Duration of recommendation pipeline stages.", self._durations),
+                ("research4all_input_size", "Sizes of recommendation inputs.", self._sizes),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for key, histogram in sorted(histograms.items()):
+                    if metric == "research4all_request_duration_seconds":
+                        labels = f'method="{key[0]}",route="{key[1]}"'
+                    elif metric == "research4all_stage_duration_seconds":
+                        labels = f'stage="{key}"'
+                    else:
+                        labels = f'input="{key}"'
+                    lines.extend(histogram.render(metric, labels))
+        return "\n".join(lines) + "\n"
+
+def server_timing_header(stages: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that opens a RequestTimings per HTTP request, records the request duration
+    by route template, times everything after the last checkpoint as "serialization" and adds
+    the Server-Timing header when enabled.
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                route_path = getattr(route, "path", "unmatched")
+                if timings.stages:
+                    self.metrics.checkpoint("serialization")
+                self.metrics.record_request(scope["method"], route_path, time.perf_counter() - started_at)
+                if self.metrics.server_timing and timings.stages:
+                    stages = timings.stages + [("total", time.perf_counter() - started_at)]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing_header(stages).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            request_timings.reset(token)
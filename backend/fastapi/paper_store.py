@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import threading
+import time
+
+# Only the fields the recommender needs, never annotations/highlights
+PAPER_PROJECTION = {
+    "_id": 0,
+    "paperId": 1,
+    "title": 1,
+    "abstract": 1,
+    "url": 1,
+    "openAccessPdf": 1,
+    "fieldsOfStudy": 1,
+    "year": 1,
+    "publicationDate": 1,
+}
+
+class PaperStoreUnavailable(RuntimeError):
+    """Raised when papers are requested by reference but no MongoDB is configured."""
+
+def normalize_paper_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a papers collection document like the Paper request model."""
+    year = document.get("year")
+    publication_date = document.get("publicationDate")
+    if not year and publication_date and str(publication_date)[:4].isdigit():
+        year = int(str(publication_date)[:4])
+    return {
+        "paperId": document["paperId"],
+        "title": document.get("title") or "",
+        "fieldsOfStudy": document.get("fieldsOfStudy") or [],
+        "abstract": document.get("abstract"),
+        "url": document.get("url"),
+        "openAccessPdf": document.get("openAccessPdf"),
+        "year": year,
+    }
+
+class PaperStore:
+    """
+    Read-through cache over the papers collection (the one research_server.py and the Node
+    backend write), so recommendation requests can reference papers by paperId only.
+    Cache misses are fetched in a single $in query per call.
+    """
+
+    def __init__(self, mongo_uri: Optional[str] = None, max_size: int = 50000, ttl_seconds: float = 3600):
+        self.mongo_uri = mongo_uri
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._client = None
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Whether papers can be resolved at all, i.e. a MongoDB is configured."""
+        return bool(self.mongo_uri)
+
+    def _collection(self):
+        if self._client is None:
+            if not self.mongo_uri:
+                raise PaperStoreUnavailable("MONGO_URI environment variable not set")
+            from pymongo import MongoClient
+            self._client = MongoClient(self.mongo_uri)
+        return self._client.get_default_database().papers
+
+    def get_many(self, paper_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Resolve paper IDs to Paper-shaped dicts. Unknown IDs are left out of the result."""
+        now = time.monotonic()
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        with self._lock:
+            for paper_id in dict.fromkeys(paper_ids):
+                entry = self._entries.get(paper_id)
+                if entry is not None and now - entry[0] < self.ttl_seconds:
+                    self._entries.move_to_end(paper_id)
+                    found[paper_id] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(paper_id)
+                    self.misses += 1
+
+        if missing:
+            documents = self._collection().find({"paperId": {"$in": missing}}, PAPER_PROJECTION)
+            fetched = {document["paperId"]: normalize_paper_document(document) for document in documents}
+            found.update(fetched)
+            with self._lock:
+                for paper_id, paper in fetched.items():
+                    self._entries[paper_id] = (now, paper)
+                    self._entries.move_to_end(paper_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
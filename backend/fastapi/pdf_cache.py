@@ -0,0 +1,357 @@
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, Set, TYPE_CHECKING
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+if TYPE_CHECKING:
+    import httpx
+
+def range_length(range_header: Optional[str], size: int) -> int:
+    """Bytes a response to the Range header sends from a body of size bytes (all of it without a valid range)."""
+    if not range_header or not range_header.startswith("bytes="):
+        return size
+    total = 0
+    try:
+        for part in range_header[len("bytes="):].split(","):
+            start, _, end = part.strip().partition("-")
+            if not start:
+                total += min(int(end), size)
+            elif int(start) < size:
+                total += min(int(end) if end else size - 1, size - 1) - int(start) + 1
+    except ValueError:
+        return size
+    return total
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a PDF URL so trivially different spellings share a cache entry."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    default_port = {"http": 80, "https": 443}.get(scheme)
+    netloc = host if parts.port in (None, default_port) else f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+@dataclass
+class PdfCacheEntry:
+    key: str
+    url: str
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    validated_at: float
+
+class PdfCache:
+    """
+    Content-addressed on-disk cache for /proxy-pdf, keyed by the normalized URL.
+
+    Each entry is a <key>.pdf body plus a <key>.json sidecar with the upstream ETag and
+    Last-Modified used for conditional revalidation. The total size is capped and the least
+    recently used entries are evicted first; access order survives restarts through the body
+    file's mtime, which is touched on every hit.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3, revalidate_after: float = 86400):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self._entries: "OrderedDict[str, PdfCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".part"):
+                # Leftover of an interrupted download
+                os.remove(os.path.join(self.directory, name))
+                continue
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as file:
+                    entry = PdfCacheEntry(**json.load(file))
+                entries.append((os.path.getmtime(self.body_path(entry)), entry))
+            except (OSError, ValueError, TypeError):
+                continue
+        for _, entry in sorted(entries, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self.total_bytes += entry.size
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+    def body_path(self, entry: PdfCacheEntry) -> str:
+        return os.path.join(self.directory, f"{entry.key}.pdf")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def lookup(self, url: str) -> Optional[PdfCacheEntry]:
+        """Return the cached entry for a URL and mark it recently used, or None (counted as a miss)."""
+        key = self.key_for(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(self.body_path(entry)):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            os.utime(self.body_path(entry))
+        except OSError:
+            pass
+        return entry
+
+    def needs_revalidation(self, entry: PdfCacheEntry) -> bool:
+        return time.time() - entry.validated_at > self.revalidate_after
+
+    def record_hit(self, entry: PdfCacheEntry, served_bytes: int) -> None:
+        """Count a response served from disk instead of upstream, with the bytes it sent (a range may be a few KB)."""
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += served_bytes
+
+    def record_not_modified(self, entry: PdfCacheEntry) -> None:
+        """Count a revalidation upstream answered with 304 and refresh the entry."""
+        with self._lock:
+            self.revalidations += 1
+            self.not_modified += 1
+            entry.validated_at = time.time()
+            self._write_meta(entry)
+
+    def record_revalidation(self) -> None:
+        """Count a revalidation that returned a new body; the download makes it a miss too."""
+        with self._lock:
+            self.revalidations += 1
+            self.misses += 1
+
+    def temp_path(self) -> str:
+        """A fresh temporary file in the cache directory to download a body into."""
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        os.close(fd)
+        return path
+
+    def store(self, url: str, temp_path: str, etag: Optional[str], last_modified: Optional[str]) -> Optional[PdfCacheEntry]:
+        """Move a completely downloaded body into the cache and evict down to the size cap."""
+        size = os.path.getsize(temp_path)
+        if size > self.max_bytes:
+            os.remove(temp_path)
+            return None
+
+        entry = PdfCacheEntry(
+            key=self.key_for(url),
+            url=normalize_url(url),
+            size=size,
+            etag=etag,
+            last_modified=last_modified,
+            validated_at=time.time(),
+        )
+        with self._lock:
+            os.replace(temp_path, self.body_path(entry))
+            self._write_meta(entry)
+            previous = self._entries.pop(entry.key, None)
+            if previous is not None:
+                self.total_bytes -= previous.size
+            self._entries[entry.key] = entry
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+                self.evictions += 1
+                for path in (self.body_path(evicted), self._meta_path(evicted.key)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        return entry
+
+    def _write_meta(self, entry: PdfCacheEntry) -> None:
+        temp_meta = self._meta_path(entry.key) + ".part"
+        with open(temp_meta, "w") as file:
+            json.dump(asdict(entry), file)
+        os.replace(temp_meta, self._meta_path(entry.key))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "revalidations": self.revalidations,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "bytes_saved": self.bytes_saved,
+            }
+
+class PdfDownload:
+    """
+    A cache fill in progress: the full upstream body being written to a .part file, independent
+    of any client. Clients follow the file as it grows and are woken after every chunk.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        # Resolves to the upstream status code once the response headers arrive, or to its error
+        self.started: "asyncio.Future[int]" = asyncio.get_running_loop().create_future()
+        # Waiters may all have gone away, don't log their unretrieved error
+        self.started.add_done_callback(lambda started: started.cancelled() or started.exception())
+        self.headers: Dict[str, str] = {}
+        self.path: Optional[str] = None
+        self.size = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.entry: Optional[PdfCacheEntry] = None
+        self._progress = asyncio.Event()
+
+    def progress(self) -> asyncio.Event:
+        """Event set on the next write or when the download ends; take it before reading the file."""
+        return self._progress
+
+    def notify(self) -> None:
+        self._progress.set()
+        self._progress = asyncio.Event()
+
+    def finish(self, error: Optional[BaseException] = None, entry: Optional[PdfCacheEntry] = None) -> None:
+        if error is not None and not isinstance(error, Exception):
+            # Cancellation (shutdown) can't be set on a future; waiters see an ordinary failure
+            error = RuntimeError(f"Download interrupted: {error!r}")
+        self.done = True
+        self.error = error
+        self.entry = entry
+        if not self.started.done():
+            self.started.set_exception(error or RuntimeError("Download ended without a response"))
+        self.notify()
+
+class PdfDownloader:
+    """
+    Single-flight cache fills: concurrent requests for one PDF share a background download of the
+    whole body, which runs to completion even when every client disconnects. Downloads run on
+    the event loop with the caller's httpx client.
+    """
+
+    FOLLOW_CHUNK_BYTES = 64 * 1024
+
+    def __init__(self, cache: PdfCache):
+        self.cache = cache
+        self._downloads: Dict[str, PdfDownload] = {}
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    def start(self, client: "httpx.AsyncClient", url: str, entry: Optional[PdfCacheEntry]) -> PdfDownload:
+        """Join the in-flight download of url, or start one in the background."""
+        key = PdfCache.key_for(url)
+        download = self._downloads.get(key)
+        if download is not None:
+            return download
+
+        download = PdfDownload(url)
+        self._downloads[key] = download
+        task = asyncio.create_task(self._run(client, download, entry))
+        self._tasks.add(task)
+
+        def forget(task: "asyncio.Task[None]") -> None:
+            self._tasks.discard(task)
+            if self._downloads.get(key) is download:
+                del self._downloads[key]
+
+        task.add_done_callback(forget)
+        return download
+
+    def cancel_all(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _run(self, client: "httpx.AsyncClient", download: PdfDownload, entry: Optional[PdfCacheEntry]) -> None:
+        """
+        Download the whole PDF into the cache, regardless of which clients are still reading it.
+        A stale entry is revalidated with a conditional request; a 304 just refreshes it.
+        """
+        headers = {"Accept-Encoding": "identity"}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        try:
+            response = await client.send(client.build_request("GET", download.url, headers=headers), stream=True)
+        except BaseException as e:
+            download.finish(error=e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        try:
+            if entry is not None and response.status_code == 304:
+                self.cache.record_not_modified(entry)
+                download.started.set_result(response.status_code)
+                download.finish(entry=entry)
+                return
+            if response.status_code != 200:
+                download.started.set_result(response.status_code)
+                download.finish()
+                return
+
+            if entry is not None:
+                self.cache.record_revalidation()
+            download.path = self.cache.temp_path()
+            # The cached body is always decoded, so the length is only known up front for identity responses
+            download.headers = {header: response.headers[header] for header in ("ETag", "Last-Modified") if header in response.headers}
+            if response.headers.get("Content-Encoding", "identity") == "identity" and "Content-Length" in response.headers:
+                download.headers["Content-Length"] = response.headers["Content-Length"]
+            download.started.set_result(response.status_code)
+
+            with open(download.path, "wb") as file:
+                async for chunk in response.aiter_bytes():
+                    file.write(chunk)
+                    file.flush()
+                    download.size += len(chunk)
+                    download.notify()
+            stored = self.cache.store(download.url, download.path, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            download.finish(entry=stored)
+        except BaseException as e:
+            download.finish(error=e)
+            if download.path is not None and os.path.exists(download.path):
+                os.remove(download.path)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            await response.aclose()
+
+    @classmethod
+    async def follow(cls, download: PdfDownload, file):
+        """Stream a download's .part file as it grows, until the download ends."""
+        try:
+            while True:
+                # Taken before reading, so a write between the read and the wait still wakes us
+                progress = download.progress()
+                chunk = file.read(cls.FOLLOW_CHUNK_BYTES)
+                if chunk:
+                    yield chunk
+                elif download.done:
+                    if download.error is not None:
+                        # Abort the response instead of ending it cleanly with a truncated PDF
+                        raise RuntimeError(f"PDF download failed: {download.error!r}")
+                    return
+                else:
+                    await progress.wait()
+        finally:
+            file.close()
@@ -1,23 +1,202 @@
-import arxiv
+import argparse
+import asyncio
 import json
 import os
-from typing import List
+import atexit
+import functools
+import inspect
+import logging
+import statistics
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List, Dict
 from mcp.server.fastmcp import FastMCP
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.collation import Collation
+from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
+from arxiv_fetcher import ArxivFetcher, TokenBucket
 
 load_dotenv()
 
+# Log to stderr, stdout carries the MCP stdio protocol
+logger = logging.getLogger("research_server")
+
+@asynccontextmanager
+async def server_lifespan(server):
+    """Release the arXiv HTTP client when the MCP server shuts down."""
+    try:
+        yield {}
+    finally:
+        await close_arxiv_fetcher()
+
 # Initialize FastMCP server
-mcp = FastMCP("research")
+mcp = FastMCP("research", lifespan=server_lifespan)
+
+# Process-wide MongoDB client, created lazily on first use
+_mongo_client = None
+_mongo_client_lock = threading.Lock()
+
+# Rendered papers://folders content, kept for a short TTL and dropped on ingest. The topic catalog
+# itself is recounted from the papers collection at most once per TTL, so topics written outside
+# search_papers (e.g. by the Node backend) and removed papers show up within that window
+TOPIC_CATALOG_TTL_SECONDS = float(os.getenv("TOPIC_CATALOG_TTL_SECONDS", "30"))
+_folders_cache = {"expires_at": 0.0, "content": None, "catalog_expires_at": 0.0}
+
+# arXiv asks for no more than one request every three seconds; one bucket paces every search
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "https://export.arxiv.org/api/query")
+arxiv_rate_limiter = TokenBucket(rate=1 / float(os.getenv("ARXIV_MIN_INTERVAL_SECONDS", "3")))
+_arxiv_fetcher = None
+
+# Per-tool latencies in milliseconds, summarized on shutdown
+tool_timings: Dict[str, List[float]] = defaultdict(list)
+
+def timed(func):
+    """Record and log how long each call of a tool or resource takes."""
+    def record(start):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        tool_timings[func.__name__].append(elapsed_ms)
+        logger.info("%s took %.1f ms", func.__name__, elapsed_ms)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record(start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(start)
+    return wrapper
+
+def log_tool_timings():
+    """Log count, mean, p95 and max latency per tool."""
+    for name, timings in sorted(tool_timings.items()):
+        p95 = statistics.quantiles(timings, n=20, method="inclusive")[-1] if len(timings) > 1 else timings[0]
+        logger.info(
+            "%s: %d calls, mean %.1f ms, p95 %.1f ms, max %.1f ms",
+            name, len(timings), statistics.fmean(timings), p95, max(timings)
+        )
+
+def check_mongo_health(client: MongoClient) -> bool:
+    """Ping the server, returns False if it can't be reached"""
+    try:
+        client.admin.command("ping")
+        return True
+    except Exception as e:
+        logger.warning("MongoDB health check failed: %s", e)
+        return False
 
 # MongoDB connection
 def get_mongo_client():
-    """Get MongoDB client connection"""
-    mongo_uri = os.getenv("MONGO_URI")
-    if not mongo_uri:
-        raise ValueError("MONGO_URI environment variable not set")
-    return MongoClient(mongo_uri)
+    """Get the shared MongoDB client, connecting on first use"""
+    global _mongo_client
+    if _mongo_client is not None:
+        return _mongo_client
+
+    with _mongo_client_lock:
+        if _mongo_client is None:
+            mongo_uri = os.getenv("MONGO_URI")
+            if not mongo_uri:
+                raise ValueError("MONGO_URI environment variable not set")
+            client = MongoClient(
+                mongo_uri,
+                maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "10")),
+                serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            )
+            if not check_mongo_health(client):
+                # Don't keep a client we couldn't reach, the next call retries
+                client.close()
+                raise ConnectionError("Could not connect to MongoDB")
+            papers_collection = client.get_default_database().papers
+            ensure_indexes(papers_collection)
+            _mongo_client = client
+    return _mongo_client
+
+def close_mongo_client():
+    """Close the shared MongoDB client and its connection pool"""
+    global _mongo_client
+    with _mongo_client_lock:
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+
+@atexit.register
+def shutdown():
+    log_tool_timings()
+    close_mongo_client()
+
+# Case-insensitive comparison (strength 2 ignores case, not accents); queries must pass the same
+# collation as the fieldsOfStudy index to use it
+TOPIC_COLLATION = Collation(locale="en", strength=2)
+
+def normalize_topic(topic: str) -> str:
+    """Normalized form of a topic, used as its topic_catalog key"""
+    return topic.strip().lower()
+
+def find_by_topic(papers_collection, topic: str, projection: dict):
+    """Papers with the topic in fieldsOfStudy, ignoring case, served by the collated fieldsOfStudy index"""
+    return papers_collection.find({"fieldsOfStudy": topic.strip()}, projection, collation=TOPIC_COLLATION)
+
+def ensure_indexes(papers_collection):
+    """Create the indexes ingestion and topic lookups rely on (no-op if they already exist)"""
+    # Same unique index the Node backend's Paper model declares, it also makes upserts race-free
+    papers_collection.create_index("paperId", unique=True)
+    # Matches papers however they were written (search_papers or the Node backend), no derived field needed
+    papers_collection.create_index("fieldsOfStudy", collation=TOPIC_COLLATION)
+
+def rebuild_topic_catalog(papers_collection):
+    """
+    Recount papers per topic into the topic_catalog collection, picking up papers saved outside
+    search_papers. Runs from papers://folders at most once per TOPIC_CATALOG_TTL_SECONDS, or on
+    demand (python research_server.py rebuild-topic-catalog); ingestion keeps the counts current
+    in between. Topics are merged rather than the collection replaced, so topics other sessions
+    add meanwhile survive; topics no paper has anymore are dropped.
+    """
+    rebuilt_at = datetime.now(timezone.utc)
+    papers_collection.aggregate([
+        {"$unwind": "$fieldsOfStudy"},
+        # One row per paper and topic, so a paper tagged "ML" and "ml" counts once
+        {"$group": {
+            "_id": {"topic": {"$toLower": {"$trim": {"input": "$fieldsOfStudy"}}}, "paper": "$_id"},
+            "name": {"$first": "$fieldsOfStudy"}
+        }},
+        {"$group": {
+            "_id": "$_id.topic",
+            "name": {"$first": "$name"},
+            "count": {"$sum": 1}
+        }},
+        {"$set": {"rebuilt_at": rebuilt_at}},
+        {"$merge": {"into": "topic_catalog", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ])
+    # Left over from an earlier rebuild: every paper with the topic has been removed or retagged.
+    # Topics ingestion created since the rebuild have no rebuilt_at and are kept
+    papers_collection.database.topic_catalog.delete_many({"rebuilt_at": {"$lt": rebuilt_at}})
+    invalidate_folders_cache()
+
+def record_topic_count(papers_collection, topic: str, added: int):
+    """Add newly tagged papers to a topic's count in the catalog"""
+    if added:
+        papers_collection.database.topic_catalog.update_one(
+            {"_id": normalize_topic(topic)},
+            {"$inc": {"count": added}, "$setOnInsert": {"name": topic}},
+            upsert=True
+        )
+        invalidate_folders_cache()
+
+def invalidate_folders_cache():
+    _folders_cache["expires_at"] = 0.0
 
 def get_papers_collection():
     """Get the papers collection from MongoDB"""
@@ -25,8 +204,66 @@ def get_papers_collection():
     db = client.get_default_database()
     return db.papers
 
+def get_arxiv_fetcher() -> ArxivFetcher:
+    global _arxiv_fetcher
+    if _arxiv_fetcher is None:
+        _arxiv_fetcher = ArxivFetcher(
+            ARXIV_API_URL,
+            arxiv_rate_limiter,
+            page_size=int(os.getenv("ARXIV_PAGE_SIZE", "100")),
+        )
+    return _arxiv_fetcher
+
+async def close_arxiv_fetcher():
+    global _arxiv_fetcher
+    if _arxiv_fetcher is not None:
+        await _arxiv_fetcher.aclose()
+        _arxiv_fetcher = None
+
+def build_paper_info(entry: dict, topic: str) -> dict:
+    return {
+        'paperId': entry['paperId'],
+        'title': entry['title'],
+        'abstract': entry['summary'],
+        'url': entry['pdf_url'],
+        'openAccessPdf': {
+            'url': entry['pdf_url'],
+            'license': 'unknown',
+            'status': 'available'
+        },
+        'fieldsOfStudy': [topic],
+        'publicationDate': entry['published'],
+        'publicationTypes': ['arxiv'],
+        'authors': entry['authors'],
+        'annotations': [],
+        'highlights': []
+    }
+
+def ingest_page(topic: str, paper_infos: List[dict]) -> Dict[str, int]:
+    return ingest_papers(get_papers_collection(), topic, paper_infos)
+
+async def fetch_and_ingest(topic: str, max_results: int) -> List[str]:
+    """Page through arXiv results for a topic, storing each page while the next one is fetched."""
+    paper_ids = []
+    pending = None
+    try:
+        async for page in get_arxiv_fetcher().search(topic, max_results):
+            paper_infos = [build_paper_info(entry, topic) for entry in page]
+            paper_ids.extend(paper_info['paperId'] for paper_info in paper_infos)
+            if pending is not None:
+                await pending
+            pending = asyncio.create_task(asyncio.to_thread(ingest_page, topic, paper_infos))
+    finally:
+        # Also when a later page fails, so the previous page is stored and its errors aren't lost
+        if pending is not None:
+            await pending
+
+    logger.info("Found %d papers for topic: %s", len(paper_ids), topic)
+    return paper_ids
+
 @mcp.tool()
-def search_papers(topic: str, max_results: int = 5) -> List[str]:
+@timed
+async def search_papers(topic: str, max_results: int = 5) -> List[str]:
     """
     Search for papers on arXiv based on a topic and store their information in the database.
     
@@ -37,80 +274,137 @@ def search_papers(topic: str, max_results: int = 5) -> List[str]:
     Returns:
         List of paper IDs found in the search
     """
-    
-    # Use arxiv to find the papers 
-    client = arxiv.Client()
+    return await fetch_and_ingest(topic, max_results)
 
-    # Search for the most relevant articles matching the queried topic
-    search = arxiv.Search(
-        query = topic,
-        max_results = max_results,
-        sort_by = arxiv.SortCriterion.Relevance
-    )
-
-    papers = client.results(search)
-    papers_collection = get_papers_collection()
+@mcp.tool()
+@timed
+async def search_papers_for_topics(topics: List[str], max_results: int = 5) -> Dict[str, List[str]]:
+    """
+    Search arXiv for several topics concurrently and store the papers in the database.
     
-    # Process each paper and add to database
-    paper_ids = []
-    for paper in papers:
-        paper_id = paper.get_short_id()
-        paper_ids.append(paper_id)
+    Args:
+        topics: The topics to search for
+        max_results: Maximum number of results to retrieve per topic (default: 5)
         
-        # Check if paper already exists in database
-        existing_paper = papers_collection.find_one({"paperId": paper_id})
-        if existing_paper:
-            print(f"Paper {paper_id} already exists in database")
+    Returns:
+        Paper IDs found for each topic
+    """
+    results = await asyncio.gather(*(fetch_and_ingest(topic, max_results) for topic in topics))
+    return dict(zip(topics, results))
+
+def ingest_papers(papers_collection, topic: str, paper_infos: List[dict]) -> Dict[str, int]:
+    """
+    Upsert a batch of papers in two round trips: one $in query to see what already exists and
+    one unordered bulk_write. New papers are inserted whole; existing papers keep their data and
+    only get the topic added to fieldsOfStudy.
+    
+    Returns counts of inserted papers, existing papers tagged with the topic, and existing papers
+    that already had it.
+    """
+    if not paper_infos:
+        return {"inserted": 0, "tagged": 0, "unchanged": 0}
+    
+    paper_ids = [paper_info['paperId'] for paper_info in paper_infos]
+    existing = {
+        paper['paperId']: {normalize_topic(field) for field in paper.get('fieldsOfStudy') or []}
+        for paper in papers_collection.find({"paperId": {"$in": paper_ids}}, {"_id": 0, "paperId": 1, "fieldsOfStudy": 1})
+    }
+    
+    operations = []
+    for paper_info in paper_infos:
+        if normalize_topic(topic) in existing.get(paper_info['paperId'], ()):
+            # Already tagged, maybe in another case; $addToSet would store "ML" next to "ml"
             continue
-            
-        paper_info = {
-            'paperId': paper_id,
-            'title': paper.title,
-            'abstract': paper.summary,
-            'url': paper.pdf_url,
-            'openAccessPdf': {
-                'url': paper.pdf_url,
-                'license': 'unknown',
-                'status': 'available'
-            },
-            'fieldsOfStudy': [topic],
-            'publicationDate': str(paper.published.date()),
-            'publicationTypes': ['arxiv'],
-            'authors': [author.name for author in paper.authors],
-            'annotations': [],
-            'highlights': []
-        }
-        
-        # Insert paper into database
-        papers_collection.insert_one(paper_info)
-        print(f"Added paper {paper_id} to database")
+        # paperId comes from the filter on insert, fieldsOfStudy is handled by $addToSet
+        new_fields = {key: value for key, value in paper_info.items() if key not in ('paperId', 'fieldsOfStudy')}
+        operations.append(UpdateOne(
+            {"paperId": paper_info['paperId']},
+            {"$setOnInsert": new_fields, "$addToSet": {"fieldsOfStudy": topic}},
+            upsert=True
+        ))
     
-    print(f"Found {len(paper_ids)} papers for topic: {topic}")
-    return paper_ids
+    if operations:
+        try:
+            papers_collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != 11000 for error in write_errors):
+                raise
+            # A concurrent search inserted the same papers first, retrying now just adds the topic
+            papers_collection.bulk_write([operations[error['index']] for error in write_errors], ordered=False)
+    
+    unique_ids = set(paper_ids)
+    stats = {
+        "inserted": len(unique_ids - existing.keys()),
+        "tagged": sum(1 for paper_id in unique_ids & existing.keys() if normalize_topic(topic) not in existing[paper_id]),
+        "unchanged": sum(1 for paper_id in unique_ids & existing.keys() if normalize_topic(topic) in existing[paper_id]),
+    }
+    record_topic_count(papers_collection, topic, stats["inserted"] + stats["tagged"])
+    logger.info("Ingested papers for topic %s: %s", topic, stats)
+    return stats
+
+# annotations and highlights can be huge, they are only returned when asked for by name
+EXTRACT_INFO_PROJECTION = {"_id": 0, "annotations": 0, "highlights": 0}
+
+def paper_projection(fields: List[str] = None) -> dict:
+    """Projection for extract_info: the requested fields (plus paperId) or the default exclusions."""
+    if not fields:
+        return EXTRACT_INFO_PROJECTION
+    projection = {"_id": 0, "paperId": 1}
+    projection.update({field: 1 for field in fields if field != "_id"})
+    return projection
+
+def dump_compact(value) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
 
 @mcp.tool()
-def extract_info(paper_id: str) -> str:
+@timed
+async def extract_info(paper_id: str, fields: List[str] = None) -> str:
     """
     Search for information about a specific paper in the database.
     
     Args:
         paper_id: The ID of the paper to look for
+        fields: Fields to return, e.g. ["title", "abstract"] (default: everything except annotations and highlights)
         
     Returns:
         JSON string with paper information if found, error message if not found
     """
-    papers_collection = get_papers_collection()
-    
-    paper = papers_collection.find_one({"paperId": paper_id})
+    # FastMCP runs sync tools on its event loop, the query runs in a thread so concurrent calls overlap
+    paper = await asyncio.to_thread(
+        lambda: get_papers_collection().find_one({"paperId": paper_id}, paper_projection(fields))
+    )
     if paper:
-        # Convert ObjectId to string for JSON serialization
-        paper['_id'] = str(paper['_id'])
-        return json.dumps(paper, indent=2, default=str)
+        return dump_compact(paper)
     else:
         return f"There's no saved information related to paper {paper_id}."
 
 @mcp.tool()
-def get_papers_by_topic(topic: str, limit: int = 10) -> List[str]:
+@timed
+async def extract_info_batch(paper_ids: List[str], fields: List[str] = None) -> str:
+    """
+    Look up several papers in the database at once.
+    
+    Args:
+        paper_ids: The IDs of the papers to look for
+        fields: Fields to return, e.g. ["title", "abstract"] (default: everything except annotations and highlights)
+        
+    Returns:
+        JSON string with a "papers" list in the requested order and the IDs that were not found under "missing"
+    """
+    unique_ids = list(dict.fromkeys(paper_ids))
+    documents = await asyncio.to_thread(
+        lambda: list(get_papers_collection().find({"paperId": {"$in": unique_ids}}, paper_projection(fields)))
+    )
+    found = {paper["paperId"]: paper for paper in documents}
+    return dump_compact({
+        "papers": [found[paper_id] for paper_id in unique_ids if paper_id in found],
+        "missing": [paper_id for paper_id in unique_ids if paper_id not in found],
+    })
+
+@mcp.tool()
+@timed
+async def get_papers_by_topic(topic: str, limit: int = 10) -> List[str]:
     """
     Get papers from the database that match a specific topic.
     
@@ -121,46 +415,63 @@ def get_papers_by_topic(topic: str, limit: int = 10) -> List[str]:
     Returns:
         List of paper IDs matching the topic
     """
-    papers_collection = get_papers_collection()
-    
     # Search for papers with the topic in fieldsOfStudy
-    papers = papers_collection.find(
-        {"fieldsOfStudy": {"$regex": topic, "$options": "i"}},
-        {"paperId": 1}
-    ).limit(limit)
+    papers = await asyncio.to_thread(
+        lambda: list(find_by_topic(get_papers_collection(), topic, {"_id": 0, "paperId": 1}).limit(limit))
+    )
     
     paper_ids = [paper['paperId'] for paper in papers]
     return paper_ids
 
 @mcp.resource("papers://folders")
+@timed
 def get_available_folders() -> str:
     """
     List all available topics in the database.
     
-    This resource provides a list of all unique topics from saved papers.
+    This resource provides a list of all unique topics from saved papers, with paper counts.
     """
-    papers_collection = get_papers_collection()
+    if _folders_cache["content"] is not None and time.monotonic() < _folders_cache["expires_at"]:
+        return _folders_cache["content"]
     
-    # Get all unique fields of study
-    topics = papers_collection.distinct("fieldsOfStudy")
-    # Flatten the list since fieldsOfStudy is an array
-    all_topics = []
-    for topic_list in topics:
-        all_topics.extend(topic_list)
-    unique_topics = list(set(all_topics))
+    # Read the maintained catalog instead of scanning every paper's fieldsOfStudy on each call
+    database = get_mongo_client().get_default_database()
+    if time.monotonic() >= _folders_cache["catalog_expires_at"]:
+        rebuild_topic_catalog(database.papers)
+        _folders_cache["catalog_expires_at"] = time.monotonic() + TOPIC_CATALOG_TTL_SECONDS
+    catalog = database.topic_catalog
+    topics = [
+        (topic.get("name", topic["_id"]).strip(), topic.get("count", 0))
+        for topic in catalog.find({"count": {"$gt": 0}}, {"name": 1, "count": 1})
+    ]
+    topics.sort(key=lambda topic: topic[0].lower())
     
     # Create a simple markdown list
     content = "# Available Topics\n\n"
-    if unique_topics:
-        for topic in sorted(unique_topics):
-            content += f"- {topic}\n"
-        content += f"\nUse @{unique_topics[0] if unique_topics else 'topic'} to access papers in that topic.\n"
+    if topics:
+        for topic, count in topics:
+            content += f"- {topic} ({count} paper{'s' if count != 1 else ''})\n"
+        content += f"\nUse @{topics[0][0]} to access papers in that topic.\n"
     else:
         content += "No topics found. Try searching for papers first.\n"
     
+    _folders_cache["content"] = content
+    _folders_cache["expires_at"] = time.monotonic() + TOPIC_CATALOG_TTL_SECONDS
     return content
 
+TOPIC_PAPER_PROJECTION = {
+    "_id": 0,
+    "title": 1,
+    "paperId": 1,
+    "authors": 1,
+    "publicationDate": 1,
+    "url": 1,
+    "fieldsOfStudy": 1,
+    "abstract": 1,
+}
+
 @mcp.resource("papers://{topic}")
+@timed
 def get_topic_papers(topic: str) -> str:
     """
     Get detailed information about papers on a specific topic from the database.
@@ -170,10 +481,8 @@ def get_topic_papers(topic: str) -> str:
     """
     papers_collection = get_papers_collection()
     
-    # Search for papers with the topic in fieldsOfStudy
-    papers = papers_collection.find(
-        {"fieldsOfStudy": {"$regex": topic, "$options": "i"}}
-    ).limit(20)  # Limit to prevent overwhelming output
+    # Search for papers with the topic in fieldsOfStudy, fetching only the fields rendered below
+    papers = find_by_topic(papers_collection, topic, TOPIC_PAPER_PROJECTION).limit(20)  # Limit to prevent overwhelming output
     
     papers_list = list(papers)
     
@@ -208,7 +517,7 @@ def generate_search_prompt(topic: str, num_papers: int = 5) -> str:
 
 Follow these instructions:
 1. First, search for papers using search_papers(topic='{topic}', max_results={num_papers})
-2. For each paper found, extract and organize the following information:
+2. Look up all papers found with a single extract_info_batch(paper_ids=[...]) call, then for each paper extract and organize the following information:
    - Paper title
    - Authors
    - Publication date
@@ -228,5 +537,18 @@ Follow these instructions:
 Please present both detailed information about each paper and a high-level synthesis of the research landscape in {topic}."""
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Research MCP server (stdio)")
+    parser.add_argument("command", nargs="?", choices=["rebuild-topic-catalog"], help="Run an admin command instead of the server")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.command == "rebuild-topic-catalog":
+        rebuild_topic_catalog(get_papers_collection())
+        logger.info("Rebuilt topic_catalog")
+        raise SystemExit(0)
+    try:
+        # Connect up front so the indexes exist before the first tool call
+        get_mongo_client()
+    except Exception as e:
+        logger.warning("MongoDB not available at startup: %s", e)
     # Initialize and run the server
     mcp.run(transport='stdio')
\ No newline at end of file
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import time
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    expires_at: float
+
+class ResponseCache:
+    """
+    Short-lived cache of serialized responses keyed by a request fingerprint, with single-flight.
+
+    Entries expire after ttl_seconds and the total body size is capped at max_bytes, evicting the
+    least recently used first. Concurrent requests with the same fingerprint share one computation
+    instead of each scoring the same body; a failed computation is not cached. Only used from the
+    event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_bytes: int = 64 * 1024 ** 2):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._in_flight: Dict[str, "asyncio.Future[bytes]"] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def fingerprint(*parts: Any) -> str:
+        """Hash of the route, any state the response depends on and the canonical request body."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.body
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.total_bytes -= len(entry.body)
+
+    def _store(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CachedResponse(body=body, expires_at=time.monotonic() + self.ttl_seconds)
+        self.total_bytes += len(body)
+        while self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[bytes]]) -> bytes:
+        """The cached body for key, or the result of compute(), shared with concurrent callers."""
+        if not self.enabled:
+            return await compute()
+
+        body = self._lookup(key)
+        if body is not None:
+            self.hits += 1
+            return body
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+
+            def finish(done: "asyncio.Future[bytes]") -> None:
+                del self._in_flight[key]
+                if not done.cancelled() and done.exception() is None:
+                    self._store(key, done.result())
+
+            task.add_done_callback(finish)
+        # A caller that disconnects must not cancel the computation the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
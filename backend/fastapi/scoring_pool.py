@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+import asyncio
+import contextvars
+import functools
+
+class ScoringPoolSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+class ScoringTimeout(Exception):
+    """Raised when a scoring job does not finish within the per-request timeout."""
+
+class ScoringPool:
+    """
+    Runs CPU-bound recommendation scoring on a bounded thread pool so it never blocks the event loop.
+
+    At most max_workers jobs run at once and at most max_queue more wait for a worker; anything
+    beyond that is rejected immediately with ScoringPoolSaturated. A job that exceeds timeout
+    seconds raises ScoringTimeout for the caller, but keeps its slot until the thread finishes
+    so the bound stays accurate.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, timeout: float = 30.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scoring")
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise ScoringPoolSaturated()
+
+        self.in_flight += 1
+        # Run in a copy of the caller's context so per-request state (e.g. metrics timings) follows the job
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(context.run, fn, *args))
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise ScoringTimeout()
+
+    def _release(self, _future) -> None:
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,194 @@
+"""
+Tests for the arXiv fetcher and search_papers ingestion against a local fake arXiv API.
+
+Run from backend/fastapi: python -m pytest -q test_arxiv_fetcher.py
+"""
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import httpx
+import pytest
+import research_server
+from arxiv_fetcher import ArxivFetcher, TokenBucket, parse_feed
+
+ENTRY = """
+  <entry>
+    <id>http://arxiv.org/abs/2101.{index:05d}v1</id>
+    <published>2021-01-{day:02d}T00:00:00Z</published>
+    <title>Paper
+      {index}</title>
+    <summary> Abstract {index} </summary>
+    <author><name>Author {index}</name></author>
+    <link title="pdf" href="http://arxiv.org/pdf/2101.{index:05d}v1" rel="related" type="application/pdf"/>
+  </entry>"""
+
+class FakeArxiv:
+    """Serves `total` results as Atom pages and records when each request arrived; pages starting at fail_from get a 500."""
+
+    def __init__(self, total: int, fail_from: int = None):
+        self.total = total
+        self.fail_from = fail_from
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                start, count = int(params["start"][0]), int(params["max_results"][0])
+                fake.requests.append((time.monotonic(), start, count))
+                if fake.fail_from is not None and start >= fake.fail_from:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                entries = "".join(
+                    ENTRY.format(index=index, day=index % 28 + 1)
+                    for index in range(start, min(start + count, fake.total))
+                )
+                body = f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/atom+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/query"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def fake_arxiv():
+    servers = []
+
+    def start(total: int, fail_from: int = None) -> FakeArxiv:
+        server = FakeArxiv(total, fail_from)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture
+def research_arxiv(monkeypatch, fake_arxiv):
+    """Point research_server's ARXIV_API_URL at a fake server, with a fast rate limit and recorded ingestion."""
+    ingested = []
+
+    def start(total: int, fail_from: int = None, page_size: int = 2):
+        server = fake_arxiv(total, fail_from)
+        monkeypatch.setattr(research_server, "ARXIV_API_URL", server.url)
+        monkeypatch.setattr(research_server, "arxiv_rate_limiter", TokenBucket(rate=50))
+        monkeypatch.setattr(research_server, "_arxiv_fetcher", None)
+        monkeypatch.setenv("ARXIV_PAGE_SIZE", str(page_size))
+        return server, ingested
+
+    yield start
+    asyncio.run(research_server.close_arxiv_fetcher())
+
+def test_parse_feed_fields():
+    entries = parse_feed(f'<feed xmlns="http://www.w3.org/2005/Atom">{ENTRY.format(index=7, day=8)}</feed>')
+    assert entries == [{
+        "paperId": "2101.00007v1",
+        "title": "Paper 7",
+        "summary": "Abstract 7",
+        "pdf_url": "http://arxiv.org/pdf/2101.00007v1",
+        "published": "2021-01-08",
+        "authors": ["Author 7"],
+    }]
+
+def test_search_pages_until_max_results(fake_arxiv):
+    server = fake_arxiv(total=10)
+
+    async def collect():
+        fetcher = ArxivFetcher(server.url, TokenBucket(rate=50), page_size=2)
+        try:
+            return [page async for page in fetcher.search("all:ml", 5)]
+        finally:
+            await fetcher.aclose()
+
+    pages = asyncio.run(collect())
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [(start, count) for _, start, count in server.requests] == [(0, 2), (2, 2), (4, 1)]
+
+def test_search_stops_at_short_page(fake_arxiv):
+    server = fake_arxiv(total=3)
+
+    async def collect():
+        fetcher = ArxivFetcher(server.url, TokenBucket(rate=50), page_size=2)
+        try:
+            return [page async for page in fetcher.search("all:ml", 10)]
+        finally:
+            await fetcher.aclose()
+
+    assert [len(page) for page in asyncio.run(collect())] == [2, 1]
+    assert len(server.requests) == 2
+
+def test_requests_are_spaced_by_the_rate_limiter(fake_arxiv):
+    server = fake_arxiv(total=10)
+    rate = 20
+
+    async def search_concurrently():
+        fetcher = ArxivFetcher(server.url, TokenBucket(rate=rate), page_size=2)
+        try:
+            async def drain(query):
+                return [page async for page in fetcher.search(query, 4)]
+            await asyncio.gather(drain("all:a"), drain("all:b"))
+        finally:
+            await fetcher.aclose()
+
+    asyncio.run(search_concurrently())
+    arrivals = sorted(arrived_at for arrived_at, _, _ in server.requests)
+    assert len(arrivals) == 4
+    # A burst would arrive within a few milliseconds; the margins allow for scheduling jitter
+    assert arrivals[-1] - arrivals[0] >= 0.9 * (len(arrivals) - 1) / rate
+    assert min(later - earlier for earlier, later in zip(arrivals, arrivals[1:])) >= 0.5 / rate
+
+def test_fetch_and_ingest_stores_every_page(research_arxiv, monkeypatch):
+    server, ingested = research_arxiv(total=10)
+    monkeypatch.setattr(research_server, "ingest_page", lambda topic, paper_infos: ingested.append((topic, [p["paperId"] for p in paper_infos])))
+
+    paper_ids = asyncio.run(research_server.fetch_and_ingest("ml", 5))
+
+    assert paper_ids == [f"2101.{index:05d}v1" for index in range(5)]
+    assert ingested == [
+        ("ml", paper_ids[0:2]),
+        ("ml", paper_ids[2:4]),
+        ("ml", paper_ids[4:5]),
+    ]
+
+def test_fetch_and_ingest_awaits_pending_page_when_a_later_fetch_fails(research_arxiv, monkeypatch):
+    server, ingested = research_arxiv(total=10, fail_from=2)
+
+    def slow_ingest(topic, paper_infos):
+        time.sleep(0.2)
+        ingested.append([p["paperId"] for p in paper_infos])
+
+    monkeypatch.setattr(research_server, "ingest_page", slow_ingest)
+
+    async def ingested_when_raised():
+        with pytest.raises(httpx.HTTPStatusError):
+            await research_server.fetch_and_ingest("ml", 5)
+        return list(ingested)
+
+    # The first page finished storing before the fetch error was raised
+    assert asyncio.run(ingested_when_raised()) == [["2101.00000v1", "2101.00001v1"]]
+
+def test_fetch_and_ingest_surfaces_pending_ingest_errors(research_arxiv, monkeypatch):
+    server, _ = research_arxiv(total=10, fail_from=2)
+
+    def failing_ingest(topic, paper_infos):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(research_server, "ingest_page", failing_ingest)
+
+    with pytest.raises(RuntimeError, match="write failed"):
+        asyncio.run(research_server.fetch_and_ingest("ml", 5))
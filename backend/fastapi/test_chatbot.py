@@ -0,0 +1,174 @@
+"""
+Tests for the chat loop's streaming and tool dispatch against a local fake Anthropic Messages API.
+
+Run from backend/fastapi: python -m pytest -q test_chatbot.py
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+from anthropic import AsyncAnthropic
+from chatbot import MCP_ChatBot
+
+def sse(event_type: str, data: dict) -> bytes:
+    return f"event: {event_type}\ndata: {json.dumps({'type': event_type, **data})}\n\n".encode()
+
+def message_events(blocks, stop_reason: str):
+    """The SSE events of one streamed assistant message made of text and tool_use blocks."""
+    yield sse("message_start", {"message": {
+        "id": "msg_test", "type": "message", "role": "assistant", "model": "test", "content": [],
+        "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": 1, "output_tokens": 1},
+    }})
+    for index, block in enumerate(blocks):
+        if block["type"] == "text":
+            yield sse("content_block_start", {"index": index, "content_block": {"type": "text", "text": ""}})
+            yield sse("content_block_delta", {"index": index, "delta": {"type": "text_delta", "text": block["text"]}})
+        else:
+            yield sse("content_block_start", {"index": index, "content_block": {"type": "tool_use", "id": block["id"], "name": block["name"], "input": {}}})
+            yield sse("content_block_delta", {"index": index, "delta": {"type": "input_json_delta", "partial_json": json.dumps(block["input"])}})
+        yield sse("content_block_stop", {"index": index})
+    yield sse("message_delta", {"delta": {"stop_reason": stop_reason, "stop_sequence": None}, "usage": {"output_tokens": 1}})
+    yield sse("message_stop", {})
+
+class FakeAnthropic:
+    """
+    Streams `tool_uses` as the first turn and a closing text turn once the request carries tool
+    results; records every request body. The first token of each turn is delayed by first_token_delay.
+    """
+
+    def __init__(self, tool_uses, first_token_delay: float = 0.0):
+        self.tool_uses = tool_uses
+        self.first_token_delay = first_token_delay
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.requests.append(body)
+                if isinstance(body["messages"][-1]["content"], list):
+                    events = message_events([{"type": "text", "text": "Done."}], "end_turn")
+                else:
+                    events = message_events(fake.tool_uses, "tool_use")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                time.sleep(fake.first_token_delay)
+                for event in events:
+                    self.wfile.write(event)
+                    self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class FakeSession:
+    """
+    MCP session stub: each call sleeps (for the next of `delays`, else `delay`) and echoes its
+    arguments; tracks calls and concurrency.
+    """
+
+    def __init__(self, delay: float = 0.05, delays=()):
+        self.delay = delay
+        self.delays = list(delays)
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def call_tool(self, name, arguments):
+        self.calls.append((name, arguments))
+        delay = self.delays.pop(0) if self.delays else self.delay
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.running -= 1
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps({"tool": name, **arguments}))], isError=False)
+
+def tool_use(index: int, name: str, **arguments) -> dict:
+    return {"type": "tool_use", "id": f"toolu_{index}", "name": name, "input": arguments}
+
+@pytest.fixture
+def fake_anthropic():
+    servers = []
+
+    def start(tool_uses, first_token_delay: float = 0.0) -> FakeAnthropic:
+        server = FakeAnthropic(tool_uses, first_token_delay)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+def run_query(server: FakeAnthropic, session: FakeSession, tool_names, tool_concurrency: int = 4) -> MCP_ChatBot:
+    async def query():
+        client = AsyncAnthropic(base_url=server.url, api_key="test", max_retries=0)
+        chatbot = MCP_ChatBot(anthropic_client=client, tool_concurrency=tool_concurrency)
+        chatbot.sessions = {name: session for name in tool_names}
+        try:
+            await chatbot.process_query("Find papers")
+        finally:
+            await client.close()
+        return chatbot
+
+    return asyncio.run(query())
+
+def sent_tool_results(server: FakeAnthropic):
+    return [(block["tool_use_id"], json.loads(block["content"])) for block in server.requests[-1]["messages"][-1]["content"]]
+
+def test_tool_results_are_sent_in_request_order(fake_anthropic):
+    server = fake_anthropic([
+        tool_use(0, "search_papers", topic="a"),
+        tool_use(1, "search_papers", topic="b"),
+        tool_use(2, "search_papers", topic="c"),
+    ])
+    # Later calls finish first, the results still go back in the order the model asked
+    run_query(server, FakeSession(delays=[0.15, 0.1, 0.05]), ["search_papers"])
+
+    assert len(server.requests) == 2
+    assert sent_tool_results(server) == [
+        ("toolu_0", {"tool": "search_papers", "topic": "a"}),
+        ("toolu_1", {"tool": "search_papers", "topic": "b"}),
+        ("toolu_2", {"tool": "search_papers", "topic": "c"}),
+    ]
+
+def test_identical_idempotent_calls_are_deduplicated(fake_anthropic):
+    server = fake_anthropic([
+        tool_use(0, "extract_info", paper_id="2101.00001v1"),
+        tool_use(1, "extract_info", paper_id="2101.00001v1"),
+        tool_use(2, "extract_info", paper_id="2101.00002v1"),
+    ])
+    session = FakeSession()
+    run_query(server, session, ["extract_info"])
+
+    assert sorted(arguments["paper_id"] for _, arguments in session.calls) == ["2101.00001v1", "2101.00002v1"]
+    assert [tool_use_id for tool_use_id, _ in sent_tool_results(server)] == ["toolu_0", "toolu_1", "toolu_2"]
+
+def test_tool_calls_respect_the_concurrency_cap(fake_anthropic):
+    server = fake_anthropic([tool_use(index, "search_papers", topic=str(index)) for index in range(6)])
+    session = FakeSession(delay=0.05)
+    run_query(server, session, ["search_papers"], tool_concurrency=2)
+
+    assert len(session.calls) == 6
+    assert session.max_running == 2
+
+def test_time_to_first_token_is_recorded_per_model_request(fake_anthropic):
+    server = fake_anthropic([tool_use(0, "search_papers", topic="a")], first_token_delay=0.1)
+    chatbot = run_query(server, FakeSession(), ["search_papers"])
+
+    # One tool turn and the closing text turn
+    assert len(chatbot.first_token_latencies) == 2
+    assert all(latency >= 0.1 for latency in chatbot.first_token_latencies)
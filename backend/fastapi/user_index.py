@@ -0,0 +1,117 @@
+from collections import Counter
+from typing import List, Dict, Optional, Set, Tuple, Iterable
+import heapq
+import math
+import threading
+import os
+
+class UserIndex:
+    """
+    Incrementally maintained TF-IDF index over user interests for mentor matching.
+
+    Users are stored as term counts in an inverted index (term -> user IDs), so a query only
+    scores users sharing at least one term with it; everyone else would have a cosine
+    similarity of 0 anyway. IDF weights are derived from the current document frequencies at
+    query time with the same formula as TfidfVectorizer (smooth idf, l2 norm), so adding or
+    removing a user never requires a refit.
+    """
+
+    def __init__(self):
+        self._analyzer_fn = None
+        self._users: Dict[str, Counter] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _analyzer(self, text: str) -> List[str]:
+        # Built on first use so scikit-learn is not imported at startup
+        if self._analyzer_fn is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._analyzer_fn = TfidfVectorizer().build_analyzer()
+        return self._analyzer_fn(text)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def upsert(self, user_id: str, interests: List[str]) -> None:
+        """Add a user or replace their interests."""
+        terms = Counter(self._analyzer(" ".join(interests)))
+        with self._lock:
+            self._remove(user_id)
+            if not terms:
+                return
+            self._users[user_id] = terms
+            for term in terms:
+                self._postings.setdefault(term, set()).add(user_id)
+
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id: str) -> None:
+        terms = self._users.pop(user_id, None)
+        if not terms:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.discard(user_id)
+                if not postings:
+                    del self._postings[term]
+
+    def user_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._users)
+
+    def interests_of(self, user_id: str) -> Optional[List[str]]:
+        """The indexed terms of a user, or None if they are not indexed."""
+        with self._lock:
+            terms = self._users.get(user_id)
+            return list(terms.elements()) if terms is not None else None
+
+    def _idf(self, term: str, n_users: int) -> float:
+        return math.log((1 + n_users) / (1 + len(self._postings.get(term, ())))) + 1
+
+    def query(self, interests: List[str], n: int = 10, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Top-n (user ID, cosine similarity) pairs for the given interests, best first."""
+        query_terms = Counter(self._analyzer(" ".join(interests)))
+        excluded = set(exclude)
+        with self._lock:
+            n_users = len(self._users)
+            idf = {term: self._idf(term, n_users) for term in query_terms}
+            query_weights = {term: count * idf[term] for term, count in query_terms.items()}
+            query_norm = math.sqrt(sum(weight * weight for weight in query_weights.values()))
+            if not query_norm:
+                return []
+
+            candidates = set()
+            for term in query_terms:
+                candidates.update(self._postings.get(term, ()))
+            candidates -= excluded
+
+            scores = []
+            for user_id in candidates:
+                terms = self._users[user_id]
+                dot = sum(query_weights[term] * count * idf[term] for term, count in terms.items() if term in query_weights)
+                user_norm = math.sqrt(sum((count * self._idf(term, n_users)) ** 2 for term, count in terms.items()))
+                scores.append((user_id, dot / (query_norm * user_norm)))
+
+        return heapq.nlargest(n, scores, key=lambda item: (item[1], item[0]))
+
+def load_user_index_from_mongo(index: UserIndex, mongo_uri: Optional[str] = None) -> int:
+    """Index every user's interests from the users collection. Returns the number of users loaded."""
+    mongo_uri = mongo_uri or os.getenv("MONGO_URI")
+    if not mongo_uri:
+        return 0
+
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_uri)
+    try:
+        users = client.get_default_database().users.find(
+            {"interests.0": {"$exists": True}}, {"_id": 1, "interests": 1}
+        )
+        for user in users:
+            index.upsert(str(user["_id"]), user["interests"])
+    finally:
+        client.close()
+    return len(index)